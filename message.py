@@ -1,7 +1,17 @@
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 
+def confidence_interval(samples, z=1.96):
+    """
+    Returns the mean and the half width of the normal confidence interval of the samples along the first axis.
+    NaN samples (e.g. undefined fairness indexes) are ignored.
+    """
+    count = np.sum(~np.isnan(samples), axis=0)
+    mean = np.nanmean(samples, axis=0)
+    half_width = z * np.nanstd(samples, axis=0, ddof=1) / np.sqrt(count) if np.all(count > 1) else np.zeros_like(mean)
+    return mean, half_width
+
 class Simulation:
     # Simulation Parameters
     arrival_rates = [1000]
@@ -22,15 +32,21 @@ class Simulation:
     cts = 2
     ack = 2
     tx_slots = packet_size / (bandwidth * slot_duration)
+
+    # Jump over idle periods to the next arrival instead of stepping one slot at a time
+    skip_idle = True
     pass
 
     def plot_simulation(self, report_single, report_singe_vcs):
+        # matplotlib is only needed for the figures, keep it out of the import of this module
+        import matplotlib.pyplot as plt
+
         # Create output directory to store images
         if not os.path.exists('out'):
             os.mkdir('out')
 
-        plt.plot(report_single['rate'], report_single['throughput_r1'])
-        plt.plot(report_singe_vcs['rate'], report_singe_vcs['throughput_r1'])
+        plt.errorbar(report_single['rate'], report_single['throughput_r1'], yerr=report_single.get('throughput_r1_ci'))
+        plt.errorbar(report_singe_vcs['rate'], report_singe_vcs['throughput_r1'], yerr=report_singe_vcs.get('throughput_r1_ci'))
         plt.legend(["(a)-CSMA", "(a)-CSMA/VCS"], loc ="lower right")
         plt.xlabel("Arrival Rate (Frames/Seconds)")
         plt.ylabel("Throughput (Kbps)")
@@ -38,8 +54,8 @@ class Simulation:
         plt.savefig('out/throughput_a.png')   # save the figure to file
 
         plt.figure()
-        plt.plot(report_single['rate'], report_single['throughput_r2'])
-        plt.plot(report_singe_vcs['rate'], report_singe_vcs['throughput_r2'])
+        plt.errorbar(report_single['rate'], report_single['throughput_r2'], yerr=report_single.get('throughput_r2_ci'))
+        plt.errorbar(report_singe_vcs['rate'], report_singe_vcs['throughput_r2'], yerr=report_singe_vcs.get('throughput_r2_ci'))
         plt.legend(["(a)-CSMA", "(a)-CSMA/VCS"], loc ="lower right")
         plt.xlabel("Arrival Rate (Frames/Seconds)")
         plt.ylabel("Throughput (Kbps)")
@@ -47,8 +63,8 @@ class Simulation:
         plt.savefig('out/throughput_c.png')   # save the figure to file
 
         plt.figure()
-        plt.plot(report_single['rate'], report_single['collisions'])
-        plt.plot(report_singe_vcs['rate'], report_singe_vcs['collisions'])
+        plt.errorbar(report_single['rate'], report_single['collisions'], yerr=report_single.get('collisions_ci'))
+        plt.errorbar(report_singe_vcs['rate'], report_singe_vcs['collisions'], yerr=report_singe_vcs.get('collisions_ci'))
         plt.legend(["(a)-CSMA", "(a)-CSMA/VCS"], loc ="lower right")
         plt.xlabel("Arrival Rate (Frames/Seconds)")
         plt.ylabel("Collissions (N)")
@@ -56,8 +72,8 @@ class Simulation:
         plt.savefig('out/collisions_a.png')   # save the figure to file
 
         plt.figure()
-        plt.plot(report_single['rate'], report_single['fairness_index'])
-        plt.plot(report_singe_vcs['rate'], report_singe_vcs['fairness_index'])
+        plt.errorbar(report_single['rate'], report_single['fairness_index'], yerr=report_single.get('fairness_index_ci'))
+        plt.errorbar(report_singe_vcs['rate'], report_singe_vcs['fairness_index'], yerr=report_singe_vcs.get('fairness_index_ci'))
         plt.legend(["(a)-CSMA", "(a)-CSMA/VCS"], loc ="lower right")
         plt.xlabel("Arrival Rate (Frames/Seconds)")
         plt.ylabel("Fairness Index (FI)")
@@ -67,24 +83,18 @@ class Simulation:
     def run_simulation(self):
 
         print("Running Simulation for Single Collision Domain...")
-        single_collision_report = {'rate': [], 'collisions': [], 'throughput_r1': [], 'throughput_r2': [], 'fairness_index': []}
+        single_collision_report = {}
         for rate in self.arrival_rates:
             performance_metrics = self.start_simulation(rate, False)
-            single_collision_report['rate'].append(performance_metrics['rate'])
-            single_collision_report['collisions'].append(performance_metrics['collisions'])
-            single_collision_report['throughput_r1'].append(performance_metrics['throughput_r1'])
-            single_collision_report['throughput_r2'].append(performance_metrics['throughput_r2'])
-            single_collision_report['fairness_index'].append(performance_metrics['fairness_index'])
+            for key, value in performance_metrics.items():
+                single_collision_report.setdefault(key, []).append(value)
 
         print("Running Simulation for Single Collision Domain with VCS enable...")
-        single_collision_vcs_report = {'rate': [], 'collisions': [], 'throughput_r1': [], 'throughput_r2': [], 'fairness_index': []}
+        single_collision_vcs_report = {}
         for rate in self.arrival_rates:
             performance_metrics = self.start_simulation(rate, True)
-            single_collision_vcs_report['rate'].append(performance_metrics['rate'])
-            single_collision_vcs_report['collisions'].append(performance_metrics['collisions'])
-            single_collision_vcs_report['throughput_r1'].append(performance_metrics['throughput_r1'])
-            single_collision_vcs_report['throughput_r2'].append(performance_metrics['throughput_r2'])
-            single_collision_vcs_report['fairness_index'].append(performance_metrics['fairness_index'])
+            for key, value in performance_metrics.items():
+                single_collision_vcs_report.setdefault(key, []).append(value)
 
         self.plot_simulation(single_collision_report, single_collision_vcs_report)
 
@@ -133,6 +143,9 @@ class Simulation:
                 current_time_slot += router2.generate_transmission()
 
             # In idle, thus increment the time slot till something to transmit
+            elif self.skip_idle:
+                next_arrival = min(router1.arrival_slot[router1.slot_index], router2.arrival_slot[router2.slot_index])
+                current_time_slot += np.ceil(next_arrival - current_time_slot)
             else:
                 current_time_slot += 1
 
@@ -147,7 +160,7 @@ class Simulation:
         throughput_1 = number_of_successes_1 * (self.packet_size / self.simulation_time)
         throughput_2 = number_of_successes_2 * (self.packet_size / self.simulation_time)
 
-        fairness_index = number_of_successes_1 / number_of_successes_2
+        fairness_index = number_of_successes_1 / number_of_successes_2 if number_of_successes_2 else float('nan')
 
         print(f"------------------------Simulation with an arrival rate of {rate} frames/sec------------------------")
         print(f"Router 1 - Total packets succesfully sent: {number_of_successes_1}, Router 2 - Total packets succesfully sent: {number_of_successes_2}")
@@ -187,8 +200,142 @@ class Router(Simulation):
         
         return arrival_time_slot_padded
 
+class VectorizedSimulation(Simulation):
+    """
+    Runs independent replications of the two router simulation as NumPy array lanes.
+    Every lane follows the same contention rules as Simulation.start_simulation.
+    """
+    replications = 30
+
+    def generate_traffic(self, arrival_rate):
+        # Same arrival process as Router.generate_traffic, one row per replication
+        size = int(arrival_rate * self.simulation_time)
+        uniform_distribution = np.random.uniform(low=0, high=1, size=(self.replications, size))
+        exponential_distribution = -(1 / arrival_rate) * np.log(1 - uniform_distribution)
+        interpacket_time_slot = np.ceil(exponential_distribution / self.slot_duration)
+        arrival_time_slot = np.cumsum(interpacket_time_slot, axis=1)
+        padding = np.full((self.replications, size), self.simulation_slots)
+
+        return np.concatenate((arrival_time_slot, padding), axis=1)
+
+    def start_simulation(self, rate, isVCSEnable):
+        lanes = np.arange(self.replications)
+        arrival_slot_1 = self.generate_traffic(rate)
+        arrival_slot_2 = self.generate_traffic(rate)
+        slot_index_1 = np.zeros(self.replications, dtype=int)
+        slot_index_2 = np.zeros(self.replications, dtype=int)
+        backoff_1 = np.full(self.replications, -1)
+        backoff_2 = np.full(self.replications, -1)
+
+        # Tracking Variables
+        extension = np.zeros(self.replications, dtype=int)
+        collision_counter = np.zeros(self.replications, dtype=int)
+
+        # Medium occupation after the backoff of a successful transmission and of a collision
+        if isVCSEnable == True:
+            transmission_slots = self.rts + self.sifs + self.cts + self.sifs + self.tx_slots + self.sifs + self.ack
+            collision_slots = self.rts + self.sifs + self.cts
+        else:
+            transmission_slots = self.tx_slots + self.sifs + self.ack
+            collision_slots = self.tx_slots + self.sifs + self.ack
+
+        # Initialize the startup timing slot
+        current_time_slot = np.minimum(arrival_slot_1[:, 0], arrival_slot_2[:, 0])
+        active = self.simulation_slots > current_time_slot
+
+        while active.any():
+            redraw = active & ((backoff_1 < 0) | (extension != 0))
+            backoff_1[redraw] = np.random.randint(0, self.cw_base * 2**extension[redraw])
+            redraw = active & ((backoff_2 < 0) | (extension != 0))
+            backoff_2[redraw] = np.random.randint(0, self.cw_base * 2**extension[redraw])
+
+            ready_1 = active & (arrival_slot_1[lanes, slot_index_1] <= current_time_slot)
+            ready_2 = active & (arrival_slot_2[lanes, slot_index_2] <= current_time_slot)
+            contention = ready_1 & ready_2
+
+            # Both frames picked the same backoff
+            collision = contention & (backoff_1 == backoff_2)
+            current_time_slot[collision] += self.difs + backoff_1[collision] + collision_slots
+            extension[collision] += 1
+            collision_counter[collision] += 1
+
+            # Adjust backoff of competing frame
+            won_1 = contention & (backoff_1 < backoff_2)
+            won_2 = contention & (backoff_1 > backoff_2)
+            backoff_2[won_1] -= backoff_1[won_1]
+            backoff_1[won_2] -= backoff_2[won_2]
+            extension[won_1 | won_2] = 0
+
+            for sending, backoff, slot_index in ((won_1 | (ready_1 & ~ready_2), backoff_1, slot_index_1),
+                                                 (won_2 | (ready_2 & ~ready_1), backoff_2, slot_index_2)):
+                current_time_slot[sending] += self.difs + backoff[sending] + transmission_slots
+                slot_index[sending] += 1
+                backoff[sending] = -1
+
+            # In idle, thus increment the time slot till something to transmit
+            idle = active & ~ready_1 & ~ready_2
+            if self.skip_idle:
+                next_arrival = np.minimum(arrival_slot_1[lanes, slot_index_1], arrival_slot_2[lanes, slot_index_2])
+                current_time_slot[idle] += np.ceil(next_arrival[idle] - current_time_slot[idle])
+            else:
+                current_time_slot[idle] += 1
+            active = self.simulation_slots > current_time_slot
+
+        # Thorughput for each respective router
+        throughput_1 = slot_index_1 * (self.packet_size / self.simulation_time)
+        throughput_2 = slot_index_2 * (self.packet_size / self.simulation_time)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fairness_index = np.where(slot_index_2 > 0, slot_index_1 / slot_index_2, np.nan)
+
+        performance_metrics = {'rate': rate}
+        for key, samples in (('collisions', collision_counter), ('throughput_r1', throughput_1),
+                             ('throughput_r2', throughput_2), ('fairness_index', fairness_index)):
+            performance_metrics[key], performance_metrics[key + '_ci'] = confidence_interval(samples.astype(float))
+
+        print(f"------------------------{self.replications} replications with an arrival rate of {rate} frames/sec------------------------")
+        print(f"Collisions: {performance_metrics['collisions']:.{2}f} +/- {performance_metrics['collisions_ci']:.{2}f}, "
+              f"Router 1 Throughput: {throughput_1.mean() * 10**(-3):.{2}f} +/- {performance_metrics['throughput_r1_ci'] * 10**(-3):.{2}f} Kbps, "
+              f"Router 2 Throughput: {throughput_2.mean() * 10**(-3):.{2}f} +/- {performance_metrics['throughput_r2_ci'] * 10**(-3):.{2}f} Kbps, "
+              f"FI: {performance_metrics['fairness_index']:.{2}f} +/- {performance_metrics['fairness_index_ci']:.{2}f}")
+
+        return performance_metrics
+
+def verify_idle_skipping(seed, rates=(100, 500, 1000)):
+    """
+    Regression check: the idle skipping engine must give the same results as stepping one slot at a time for a fixed seed.
+    """
+    for rate in rates:
+        for isVCSEnable in (False, True):
+            reports = []
+            for skip_idle in (False, True):
+                simulation = Simulation()
+                simulation.skip_idle = skip_idle
+                np.random.seed(seed)
+                reports.append(simulation.start_simulation(rate, isVCSEnable))
+            if not np.array_equal(list(reports[0].values()), list(reports[1].values()), equal_nan=True):
+                raise AssertionError(f"Idle skipping changed the results for rate {rate}, VCS {isVCSEnable}: {reports[0]} != {reports[1]}")
+    print(f"Idle skipping matches slot stepping for seed {seed}")
+
 def main():
-    simulation = Simulation()
+    parser = argparse.ArgumentParser(description='Run the two router CSMA/CA simulation.')
+    parser.add_argument('--replications', type=int, default=None,
+                        help='Run this many independent replications as array lanes and report confidence intervals')
+    parser.add_argument('--verify-idle-skip', type=int, default=None, metavar='SEED',
+                        help='Check that idle skipping gives the same results as slot stepping for the seed and exit')
+
+    args = parser.parse_args()
+
+    if args.verify_idle_skip is not None:
+        verify_idle_skipping(args.verify_idle_skip)
+        return
+
+    if args.replications is None:
+        simulation = Simulation()
+    else:
+        simulation = VectorizedSimulation()
+        simulation.replications = args.replications
     simulation.run_simulation()
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -4,4 +4,5 @@ setup(
     name='ece576',
     version='0.1',
     packages=find_packages(include=['src*', 'utility*']),
+    python_requires='>=3.10',
 )
@@ -0,0 +1,227 @@
+"""
+benchmark.py
+
+Description:
+    The benchmark module measures the speed of the simulation engines on fixed-seed scenarios.
+    It covers Network.run with 2, 10, 50 and 200 stations, low and saturated arrival rates, single and multiple
+    collision domains, multi-AP topologies placed in a 2-D area with hidden terminals, the parallel simulation of
+    disjoint components, the array based single-domain engine, and the two router model of message.py.
+
+Responsibilities:
+    - Runs every scenario in a fresh process and reports wall time, events/sec and peak RSS.
+    - Writes the results as JSON and compares them against a stored baseline.
+
+Usage:
+    - python sim/benchmark.py --output sim/output/benchmark_baseline.json
+    - python sim/benchmark.py --baseline sim/output/benchmark_baseline.json --tolerance 0.2
+"""
+
+# benchmark.py
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# message.py lives at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sim_tb import load_parameters, build_network, build_vectorized_network
+from utility.topology_generator import generate_topology
+
+STATION_COUNTS = (2, 10, 50, 200)
+ARRIVAL_RATES = {'low': 100, 'saturated': 2000}
+
+def scenario_topology(stations, domains):
+    """
+    Returns a test topology with the stations spread round robin over the given number of collision domains,
+    each domain having its own AP.
+    """
+    return {'tx_nodes': [{'id': i + 1, 'cd': [i % domains]} for i in range(stations)],
+            'ap_nodes': [{'id': i + 1, 'cd': [i]} for i in range(domains)]}
+
+def build_scenarios(simulation_time, message_time):
+    """
+    Returns the list of benchmark scenarios.
+    """
+    scenarios = []
+    for stations in STATION_COUNTS:
+        for load, rate in ARRIVAL_RATES.items():
+            for domains in (1, max(2, stations // 10)):
+                scenarios.append({'name': f"network_{stations}sta_{load}_{domains}cd", 'engine': 'network',
+                                  'stations': stations, 'lambda': rate, 'domains': domains,
+                                  'simulation_time': simulation_time})
+            domains = max(2, stations // 10)
+            scenarios.append({'name': f"spatial_{stations}sta_{load}_{domains}ap", 'engine': 'network',
+                              'layout': 'spatial', 'stations': stations, 'lambda': rate, 'domains': domains,
+                              'simulation_time': simulation_time})
+            scenarios.append({'name': f"parallel_{stations}sta_{load}_{domains}cd", 'engine': 'parallel',
+                              'stations': stations, 'lambda': rate, 'domains': domains,
+                              'simulation_time': simulation_time})
+            scenarios.append({'name': f"vectorized_{stations}sta_{load}_1cd", 'engine': 'vectorized',
+                              'stations': stations, 'lambda': rate, 'domains': 1,
+                              'simulation_time': simulation_time})
+    for load, rate in ARRIVAL_RATES.items():
+        scenarios.append({'name': f"message_2sta_{load}", 'engine': 'message', 'stations': 2, 'lambda': rate,
+                          'domains': 1, 'simulation_time': message_time})
+    return scenarios
+
+def peak_rss_kb():
+    """
+    Returns the peak resident set size of the current process in KB, None where it is not available.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KB
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def spatial_topology(stations, aps, seed):
+    """
+    Returns a topology of APs on a lattice with about 100 units between neighbouring APs and a carrier-sense range of 60,
+    so neighbouring cells overlap and create hidden terminals.
+    """
+    side = 100 * aps ** 0.5
+    return generate_topology(aps, stations, (side, side), 60, seed=seed)
+
+def run_network_scenario(scenario, seed):
+    """
+    Runs Network.run, its parallel components or the vectorized engine on the scenario and returns the number of processed events.
+    Every node draws from its own streams of the seed, so a scenario replays the same events on every run.
+    """
+    sim_params = load_parameters('sim/settings/settings.json')
+    sim_params['lambda_A'] = scenario['lambda']
+    sim_params['simulation_time'] = scenario['simulation_time']
+    if scenario.get('layout') == 'spatial':
+        topology = spatial_topology(scenario['stations'], scenario['domains'], seed)
+    else:
+        topology = scenario_topology(scenario['stations'], scenario['domains'])
+    if scenario['engine'] == 'vectorized':
+        network = build_vectorized_network(sim_params, topology, seed)
+    else:
+        network = build_network(sim_params, topology, seed=seed)
+    if scenario['engine'] == 'parallel':
+        network.run_components(seed=int(np.random.randint(2**32)), report=False)
+    else:
+        network.run(report=False)
+    return network.events_processed
+
+def run_message_scenario(scenario):
+    """
+    Runs message.Simulation.start_simulation on the scenario and returns the number of contention outcomes.
+    """
+    import message
+    # Router reads its parameters from the Simulation class
+    message.Simulation.simulation_time = scenario['simulation_time']
+    message.Simulation.simulation_slots = round(scenario['simulation_time'] / message.Simulation.slot_duration)
+    simulation = message.Simulation()
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            metrics = simulation.start_simulation(scenario['lambda'], False)
+        finally:
+            sys.stdout = stdout
+    frames_per_router = simulation.simulation_time / simulation.packet_size
+    return int(round((metrics['throughput_r1'] + metrics['throughput_r2']) * frames_per_router)) + metrics['collisions']
+
+def run_scenario(scenario, seed, repeat=1):
+    """
+    Runs a single scenario with a fixed seed and measures it. Executed in a fresh worker process.
+    The scenario is repeated and the fastest run is kept, to filter out noise on short scenarios.
+    """
+    wall_time = None
+    for _ in range(repeat):
+        random.seed(seed)
+        np.random.seed(seed)
+        start = time.perf_counter()
+        if scenario['engine'] == 'message':
+            events = run_message_scenario(scenario)
+        else:
+            events = run_network_scenario(scenario, seed)
+        elapsed = time.perf_counter() - start
+        wall_time = elapsed if wall_time is None else min(wall_time, elapsed)
+    return {**scenario, 'seed': seed, 'wall_time_s': wall_time, 'events': events,
+            'events_per_s': events / wall_time if wall_time > 0 else None, 'peak_rss_kb': peak_rss_kb()}
+
+def run_benchmark(scenarios, seed=0, repeat=1):
+    """
+    Runs every scenario in its own process, one at a time, so timings do not compete for the CPU
+    and the peak RSS belongs to a single scenario.
+    """
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for scenario in scenarios:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_scenario, scenario, seed, repeat).result()
+        print(f"{result['name']:<32} {result['wall_time_s']:8.3f} s {result['events_per_s'] or 0:12.0f} events/s "
+              f"{result['peak_rss_kb'] or 0:10d} KB")
+        results.append(result)
+    return results
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Prints the speed of every scenario relative to the baseline.
+    :return: Names of the scenarios whose events/sec dropped by more than the tolerance.
+    """
+    baseline_results = {result['name']: result for result in baseline['scenarios']}
+    regressions = []
+    for result in results:
+        reference = baseline_results.get(result['name'])
+        if reference is None or not reference['events_per_s'] or not result['events_per_s']:
+            continue
+        ratio = result['events_per_s'] / reference['events_per_s']
+        flag = ''
+        if ratio < 1 - tolerance:
+            regressions.append(result['name'])
+            flag = '  REGRESSION'
+        print(f"{result['name']:<32} {ratio:6.2f}x baseline{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the simulation engines on fixed-seed scenarios.')
+    parser.add_argument('--output', type=str, default='sim/output/benchmark.json', help='JSON file for the results')
+    parser.add_argument('--baseline', type=str, default=None, help='JSON results of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative drop of events/sec against the baseline')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of every scenario')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario, the fastest one is reported')
+    parser.add_argument('--simulation-time', type=float, default=1.0, help='Simulated seconds of the Network scenarios')
+    parser.add_argument('--message-time', type=float, default=10.0, help='Simulated seconds of the message.py scenarios')
+    parser.add_argument('--filter', type=str, default=None, help='Only run the scenarios whose name contains this text')
+
+    args = parser.parse_args()
+    if args.baseline and os.path.abspath(args.baseline) == os.path.abspath(args.output):
+        parser.error("--baseline must differ from --output, the results would overwrite the baseline")
+
+    # Read before anything is written, so the baseline is the one of the previous run
+    baseline = load_parameters(args.baseline) if args.baseline else None
+
+    scenarios = build_scenarios(args.simulation_time, args.message_time)
+    if args.filter:
+        scenarios = [scenario for scenario in scenarios if args.filter in scenario['name']]
+
+    results = run_benchmark(scenarios, args.seed, args.repeat)
+    report = {'python': platform.python_version(), 'platform': platform.platform(),
+              'numpy': np.__version__, 'scenarios': results}
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {len(results)} scenarios to {args.output}")
+
+    if baseline is not None:
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} scenario(s) slower than the baseline: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
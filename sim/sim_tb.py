@@ -14,58 +14,312 @@ Usage:
 import argparse
 import json
 import os
-from utility.poisson_traffic import generate_poisson_traffic
+import numpy as np
+from utility.poisson_traffic import ArrayTrafficSource, PoissonTrafficSource
+from utility.traffic_models import generate_arrivals
+from utility.random_streams import node_streams
 from utility.logger_config import setup_logger, logger
-from utility.plot_timeline import EventVisualizer
 from src.csma_ca_ap import CsmaCaAp
 from src.csma_ca_tx import CsmaCaTx
 from src.network import Network
+from src.vectorized_network import VectorizedNetwork
+from src.profiler import NetworkProfiler
+from src.bianchi_model import bianchi_saturation
+from src.batch_means import BatchMeans
+from src.warmup import WarmupDetector
+from src.streaming_metrics import StreamingMetrics
+from src.checkpoint import load_checkpoint
+from utility.result_cache import ResultCache, cache_key
+from utility.trace_export import export_run
 
 def load_parameters(file_name):
     with open(file_name, 'r') as file:
         return json.load(file)
 
-def create_and_run_simulation(params):
-    visualizer = None
-    # visualizer = EventVisualizer()
-    
-    logger.info('Starting CSMA/CA simulation testbench')
+def load_topology(test_params):
+    """
+    Returns the Tx and AP node lists of a test, each node carrying the list of its collision domains.
+    Tests either list the nodes directly ("tx_nodes"/"ap_nodes") or group them per collision domain ("collision_domains").
+    """
+    if "collision_domains" not in test_params:
+        return test_params['tx_nodes'], test_params['ap_nodes']
 
-    sim_params = load_parameters('sim/settings/settings.json')
-    test_params = load_parameters(params.test_file)
+    tx_nodes = {}
+    ap_nodes = {}
+    for collision_id, domain in test_params["collision_domains"].items():
+        for tx_node in domain.get('tx_nodes', []):
+            node = tx_nodes.setdefault(tx_node['id'], dict(tx_node, cd=[]))
+            node['cd'].append(collision_id)
+        for ap_id in domain.get('ap_nodes', []):
+            node = ap_nodes.setdefault(ap_id, {'id': ap_id, 'cd': []})
+            node['cd'].append(collision_id)
+    return list(tx_nodes.values()), list(ap_nodes.values())
+
+def load_sim_params(test_params, settings_file='sim/settings/settings.json'):
+    """
+    Loads the default simulation parameters and overwrites them with the ones specified by the test.
+    """
+    sim_params = load_parameters(settings_file)
 
     # Overwrite simulation parameters with test parameters if they are specified
     if "sim_overwrite" in test_params:
         for key, value in test_params["sim_overwrite"].items():
             sim_params[key] = value
+    return sim_params
 
-    logger.info(f'Using simulation parameters:\n {json.dumps(sim_params, indent=2)}')
+def create_arrivals(sim_params, tx_nodes, rngs=None):
+    """
+    Returns the arrivals of every Tx node: its explicit arrivals, or a source of the "traffic_model" of the simulation
+    starting with a packet at slot 0. A Tx node can set its own rate with "lambda", lambda_A by default.
+    Poisson sources are generated lazily per node; the other models are generated for all the nodes at once up to the
+    end of the simulation, see utility/traffic_models.py.
+    :param rngs: Traffic numpy.random.Generator of every Tx node, None for the global numpy random state.
+    """
+    rngs = rngs if rngs is not None else [None] * len(tx_nodes)
+    model = sim_params.get('traffic_model', 'poisson')
+    generated = [index for index, tx_node in enumerate(tx_nodes) if "arrivals" not in tx_node]
+    rates = [tx_nodes[index].get('lambda', sim_params['lambda_A']) for index in generated]
 
-    # Create network with collision domains
+    arrivals = [tx_node.get("arrivals") for tx_node in tx_nodes]
+    if model == 'poisson':
+        for index, rate in zip(generated, rates):
+            arrivals[index] = PoissonTrafficSource(rate, sim_params['slot_duration'], initial_arrivals=[0],
+                                                   rng=rngs[index])
+        return arrivals
+
+    options = {'on_time': sim_params['burst_on_time'], 'off_time': sim_params['burst_off_time']} \
+        if model == 'mmpp' and 'burst_on_time' in sim_params else {}
+    rng = [rngs[index] for index in generated] if rngs[0] is not None else None
+    horizon = int(sim_params['simulation_time'] / sim_params['slot_duration'])
+    offsets, flat = generate_arrivals(model, rates, horizon, sim_params['slot_duration'], rng, **options)
+    for row, index in enumerate(generated):
+        arrivals[index] = ArrayTrafficSource(flat[offsets[row]:offsets[row + 1]], initial_arrivals=[0])
+    return arrivals
+
+def build_network(sim_params, test_params, visualizer=None, seed=None):
+    """
+    Creates the network with its collision domains and the Tx and AP nodes described by the test.
+    With a seed, every Tx node gets its own backoff and traffic streams keyed by its ID, instead of the global ones.
+    """
     network = Network(sim_params)
-    for tx_node in test_params['tx_nodes']:
-        if "arrivals" in tx_node:
-            arrivals = tx_node["arrivals"]
-        else:
-            arrivals = [0] + generate_poisson_traffic(sim_params['lambda_A'], sim_params['simulation_time'], sim_params['slot_duration']).tolist()
-        
-        node = CsmaCaTx(f"Tx_Node_{tx_node['id']}", tx_node['cd'],sim_params, arrivals, visualizer)
+    tx_nodes, ap_nodes = load_topology(test_params)
+    tx_ids = [f"Tx_Node_{tx_node['id']}" for tx_node in tx_nodes]
+    streams = [node_streams(seed, node_id) for node_id in tx_ids] if seed is not None else [(None, None)] * len(tx_ids)
+    tx_arrivals = create_arrivals(sim_params, tx_nodes, [traffic_rng for _, traffic_rng in streams])
+    for tx_node, node_id, (backoff_rng, _), arrivals in zip(tx_nodes, tx_ids, streams, tx_arrivals):
+        node = CsmaCaTx(node_id, tx_node['cd'],sim_params, arrivals, visualizer, backoff_rng)
         network.add(node)
 
-    for ap_node in test_params['ap_nodes']:
+    for ap_node in ap_nodes:
         node = CsmaCaAp(f"AP_Node_{ap_node['id']}", ap_node['cd'],sim_params, visualizer)
         network.add(node)
+    return network
+
+def build_vectorized_network(sim_params, test_params, seed=None):
+    """
+    Creates the array based engine for a test made of a single collision domain with one AP.
+    With a seed, the traffic of every Tx node is drawn from the same stream as in build_network, and the backoffs of
+    all the stations from one stream spawned from the seed.
+    """
+    tx_nodes, ap_nodes = load_topology(test_params)
+    collision_domains = {collision_id for node in tx_nodes + ap_nodes for collision_id in node['cd']}
+    if len(collision_domains) != 1 or len(ap_nodes) != 1:
+        raise ValueError("The vectorized engine only supports a single collision domain with one AP.")
+
+    tx_ids = [f"Tx_Node_{tx_node['id']}" for tx_node in tx_nodes]
+    tx_arrivals = create_arrivals(sim_params, tx_nodes,
+                                  [node_streams(seed, tx_id)[1] for tx_id in tx_ids] if seed is not None else None)
+    rng = np.random.default_rng(np.random.SeedSequence(seed)) if seed is not None else None
+    return VectorizedNetwork(sim_params, tx_arrivals, tx_ids, f"AP_Node_{ap_nodes[0]['id']}", rng)
+
+def create_and_run_simulation(params):
+    visualizer = None
+    if params.visualize:
+        # matplotlib is only imported when something is plotted
+        from utility.plot_timeline import EventVisualizer
+        visualizer = EventVisualizer()
+    
+    logger.info('Starting CSMA/CA simulation testbench')
+
+    test_params = load_parameters(params.test_file)
+    sim_params = load_sim_params(test_params)
 
-    # visualizer.initialize(network.nodes)
+    logger.info('Using simulation parameters:\n %s', json.dumps(sim_params, indent=2))
+
+    if params.analytical:
+        print_analytical_estimate(sim_params, test_params)
+        return
+
+    if params.resume:
+        # The checkpoint holds the network with its observers, only the run settings are taken from the arguments
+        network = load_checkpoint(params.resume)
+        logger.info(f'Resuming {params.resume} at slot {network.current_slot}')
+        if not network.run(checkpoint=params.checkpoint or params.resume,
+                           checkpoint_interval=params.checkpoint_interval, time_budget=params.time_budget):
+            return
+        report_run(network, params)
+        return
+
+    cache = None
+    if params.cache:
+        # Everything that selects how the results are computed, so a cached result always comes from the same mode
+        options = {'engine': params.engine, 'workers': params.workers, 'precision': params.precision,
+                   'batch_slots': params.batch_slots, 'warmup': params.warmup, 'warmup_window': params.warmup_window}
+        cache = ResultCache(params.cache_dir, params.cache_size * 2**20)
+        key = cache_key(sim_params, test_params, params.seed, options)
+        # The cache only holds the statistics, runs that report or write anything else are simulated again
+        reports_more = params.timeline or params.profile or params.export or params.metrics is not None or \
+            params.precision is not None
+        cached = None if reports_more else cache.get(key)
+        if cached is not None:
+            logger.info(f'Using the cached results of {key}')
+            print_statistics(cached[0]['statistics'])
+            return
+
+    if params.engine == 'vectorized':
+        network = build_vectorized_network(sim_params, test_params, params.seed)
+        network.run()
+        if cache is not None:
+            cache.put(key, {'statistics': network.get_statistics()})
+        return
+
+    # Create network with collision domains
+    network = build_network(sim_params, test_params, visualizer, params.seed)
+
+    if visualizer is not None:
+        visualizer.initialize(network.nodes)
     network.print_network_structure()
-    network.run()
+    if params.profile:
+        network.profiler = NetworkProfiler(params.profile_interval)
+    if params.precision is not None:
+        network.batch_means = BatchMeans(params.batch_slots, params.precision, truncate_warmup=params.warmup)
+    if params.warmup:
+        network.warmup = WarmupDetector(params.warmup_window)
+    if params.metrics is not None:
+        network.metrics = StreamingMetrics(params.metrics_window, snapshot_slots=params.metrics,
+                                           output=params.metrics_output)
+    if params.workers is not None:
+        network.run_components(params.workers, params.seed)
+    elif not network.run(checkpoint=params.checkpoint, checkpoint_interval=params.checkpoint_interval,
+                         time_budget=params.time_budget):
+        logger.info(f'Resume the run with --resume {params.checkpoint}' if params.checkpoint else 'Run interrupted')
+        return
+
+    if cache is not None:
+        histories = {str(node.ID): node.history.to_array() for node in network.nodes} if params.cache_histories else None
+        cache.put(key, {'statistics': network.get_statistics()}, histories)
+
+    report_run(network, params)
+
+def report_run(network, params):
+    """
+    Logs the batch means and profiling summaries of a finished run, exports it and renders its timeline.
+    """
+    if network.batch_means is not None:
+        logger.info('Batch means: %s', json.dumps(network.batch_means.summary()))
+
+    if network.metrics is not None:
+        if network.metrics.output is not None:
+            logger.info(f'Metric snapshots written to {network.metrics.output}')
+        for snapshot in network.metrics.snapshots:
+            logger.info('Metrics at slot %d: %s', snapshot['slot'], json.dumps(snapshot['network']))
+
+    if network.profiler is not None:
+        for line in network.profiler.format_summary():
+            logger.info(line)
+        if params.profile_output:
+            with open(params.profile_output, 'w') as file:
+                json.dump(network.profiler.summary(), file, indent=2)
+
+    if params.export:
+        export_run(network, params.export, {'test_file': params.test_file, 'seed': params.seed})
+        logger.info(f'Run exported to {params.export}')
+
+    if params.timeline:
+        from utility.plot_timeline import render_timeline
+        render_timeline(network.nodes, params.timeline, params.window)
+        logger.info(f'Timeline written to {params.timeline}')
+
+def print_statistics(statistics):
+    """
+    Prints node statistics in the format of CsmaCaTx.print_statistics and CsmaCaAp.print_statistics.
+    """
+    for node_statistics in statistics:
+        if node_statistics['type'] == 'TX':
+            print(f"TX: {node_statistics['node']}: Successful Transmission: {node_statistics['successful_transmissions']}")
+            print(f"TX: {node_statistics['node']}: Throughput: {node_statistics['throughput_kbps']:.2f} Kbps")
+        else:
+            print(f"AP: {node_statistics['node']} Collisions: {node_statistics['collisions']}")
+
+def print_analytical_estimate(sim_params, test_params):
+    """
+    Prints the saturation estimate of the Bianchi model for the Tx nodes of the test, as if they shared one domain.
+    """
+    tx_nodes, _ = load_topology(test_params)
+    estimate = bianchi_saturation(sim_params, len(tx_nodes))
+    print(f"Bianchi estimate for {estimate['stations']} saturated Tx nodes: "
+          f"collision probability {estimate['collision_probability']:.3f}, tau {estimate['tau']:.4f}")
+    print(f"Throughput: {estimate['throughput_kbps']:.2f} Kbps, {estimate['throughput_per_station_kbps']:.2f} Kbps per Tx node")
+    print(f"AP collisions: {estimate['collisions_per_second'] * sim_params['simulation_time']:.0f} "
+          f"in {sim_params['simulation_time']} s")
+
+def parse_window(text):
+    """
+    Parses a START:END slot range.
+    """
+    start, _, end = text.partition(':')
+    return int(start), int(end)
 
 def main():
     parser = argparse.ArgumentParser(description='Run the network simulation with specified test parameters.')
     parser.add_argument('test_file', type=str, help='Path to the test parameters JSON file', nargs='?')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode for verbose logging')
+    parser.add_argument('--engine', choices=['network', 'vectorized'], default='network',
+                        help='Simulate with Network objects, or with the array based engine for single-domain tests')
+    parser.add_argument('--analytical', action='store_true',
+                        help='Print the Bianchi saturation estimate of the test instead of simulating it')
+    parser.add_argument('--precision', type=float, default=None, metavar='REL',
+                        help='Stop once the 95%% confidence intervals of throughput and collisions are within REL of their mean')
+    parser.add_argument('--batch-slots', type=int, default=20000, help='Length of a batch of --precision in slots')
+    parser.add_argument('--warmup', action='store_true',
+                        help='Detect the start-up transient with MSER-5 and only report the statistics after it')
+    parser.add_argument('--warmup-window', type=int, default=5000, help='Length of a throughput window of --warmup in slots')
+    parser.add_argument('--metrics', type=int, default=None, metavar='SLOTS',
+                        help='Take a snapshot of the windowed throughput, collision rate, fairness and delay '
+                             'percentiles every SLOTS slots')
+    parser.add_argument('--metrics-window', type=int, default=50000, metavar='SLOTS',
+                        help='Length of the sliding window of --metrics')
+    parser.add_argument('--metrics-output', type=str, default=None,
+                        help='Write the snapshots of --metrics to this JSON lines file')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Simulate the disjoint collision-domain components in this many worker processes')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Give every Tx node its own random streams spawned from this seed')
+    parser.add_argument('--cache', action='store_true', help='Reuse the cached results of an identical seeded run')
+    parser.add_argument('--cache-dir', type=str, default='sim/output/cache', help='Directory of the result cache')
+    parser.add_argument('--cache-size', type=int, default=512, metavar='MB', help='Size cap of the result cache')
+    parser.add_argument('--cache-histories', action='store_true', help='Also cache the node histories')
+    parser.add_argument('--checkpoint', type=str, default=None, metavar='PATH',
+                        help='Periodically save the state of the run to this file')
+    parser.add_argument('--checkpoint-interval', type=float, default=600, metavar='SECONDS',
+                        help='Wall-clock time between two checkpoints')
+    parser.add_argument('--time-budget', type=float, default=None, metavar='SECONDS',
+                        help='Stop the run cleanly after this wall-clock time, saving a checkpoint')
+    parser.add_argument('--resume', type=str, default=None, metavar='PATH',
+                        help='Continue the run saved in this checkpoint, the test file must be the one it started from')
+    parser.add_argument('--profile', action='store_true', help='Report the time spent in each phase of Network.run')
+    parser.add_argument('--profile-interval', type=int, default=None, metavar='SLOTS',
+                        help='Also sample the profiling counters every SLOTS simulated slots')
+    parser.add_argument('--profile-output', type=str, default=None, help='Write the profiling summary to this JSON file')
+    parser.add_argument('--visualize', action='store_true', help='Plot every event live while the simulation runs (slow)')
+    parser.add_argument('--export', type=str, default=None, metavar='DIR',
+                        help='Write the node statistics and histories to DIR as memory-mappable .npy columns')
+    parser.add_argument('--timeline', type=str, default=None, help='Render the node histories to this image after the run')
+    parser.add_argument('--window', type=parse_window, default=None, metavar='START:END',
+                        help='Only render the timeline between these slots')
 
     args = parser.parse_args()
+    setup_logger(debug=args.debug)
 
     if args.test_file is None:
         args.test_file = 'hw2_1'
@@ -73,6 +327,24 @@ def main():
     args.test_file = os.path.join('sim/tst', args.test_file + '.json')
     if not os.path.exists(args.test_file):
         parser.error(f"The test file {args.test_file} does not exist")
+    if args.engine == 'vectorized' and (args.visualize or args.timeline or args.profile or args.export or
+                                        args.metrics is not None):
+        parser.error("The vectorized engine does not record histories, profiles or metrics")
+    if args.engine == 'vectorized' and (args.precision is not None or args.warmup or
+                                        args.batch_slots != parser.get_default('batch_slots') or
+                                        args.warmup_window != parser.get_default('warmup_window')):
+        parser.error("The vectorized engine has no batch means or warm-up detection")
+    if (args.precision is not None or args.warmup or args.metrics is not None) and args.workers is not None:
+        parser.error("--precision, --warmup and --metrics need the sequential run")
+    if args.workers is not None and (args.engine == 'vectorized' or args.visualize or args.profile):
+        parser.error("Parallel runs only use the network engine, without live visualization or profiling")
+    if args.cache and args.seed is None:
+        parser.error("--cache needs a --seed, unseeded runs are not reproducible")
+    if (args.checkpoint or args.resume or args.time_budget is not None) and \
+            (args.workers is not None or args.engine == 'vectorized' or args.visualize):
+        parser.error("Checkpoints only work with the sequential network run, without live visualization")
+    if args.resume and not os.path.exists(args.resume):
+        parser.error(f"The checkpoint {args.resume} does not exist")
 
     create_and_run_simulation(args)
 
@@ -0,0 +1,240 @@
+"""
+sweep.py
+
+Description:
+    The sweep module runs the network simulation over a grid of parameters.
+    Every grid point is an independent Network run, so the points are spread across a pool of worker processes.
+
+Responsibilities:
+    - Expands the parameter grid on top of sim/settings/settings.json and the test overwrites.
+    - Gives every grid point its own seed derived from a single root seed and the point itself.
+    - Optionally reuses the cached results of the points that were already simulated, see utility/result_cache.py.
+    - Optionally stops every run once its metrics are precise enough, and replicates only the points whose single run
+      could not reach the precision.
+    - Gathers the per-node statistics of every run into one results table.
+    - Optionally exports the traces of every simulated run, one directory per seed, see utility/trace_export.py.
+
+Usage:
+    - python sim/sweep.py hw2_1 --grid lambda_A=200,500,1000 --grid CW0=8,16 --nodes 2,10
+"""
+
+# sweep.py
+import argparse
+import csv
+import itertools
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sim_tb import load_parameters, load_sim_params, build_network
+from src.batch_means import BatchMeans, relative_half_width
+from src.warmup import WarmupDetector
+from utility.result_cache import ResultCache, cache_key
+from utility.trace_export import export_run
+
+def single_domain_topology(tx_count):
+    """
+    Returns a test topology with tx_count Tx nodes and one AP sharing a single collision domain.
+    """
+    return {'tx_nodes': [{'id': i + 1, 'cd': [0]} for i in range(tx_count)],
+            'ap_nodes': [{'id': 1, 'cd': [0]}]}
+
+# Parameters of virtual carrier sensing (RTS/CTS), which the nodes do not model. Sweeping them would only rerun the
+# same configuration under other seeds
+UNMODELLED_PARAMETERS = ('vcs', 'RTS_size', 'CTS_size')
+
+def check_grid(grid):
+    """
+    Raises a ValueError if the grid sweeps a parameter the simulation does not read.
+    """
+    unmodelled = [key for key in grid if key in UNMODELLED_PARAMETERS]
+    if unmodelled:
+        raise ValueError(f"Cannot sweep {', '.join(unmodelled)}: virtual carrier sensing is not simulated.")
+
+def expand_grid(grid):
+    """
+    Expands a dictionary of parameter name -> list of values into the list of all parameter combinations.
+    """
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+def run_point(sim_params, test_params, seed, precision=None, max_replications=1, batch_slots=20000, warmup=False,
+              export=None):
+    """
+    Runs a single grid point and returns the statistics of every node.
+    Executed in a worker process.
+    :param precision: Relative confidence interval width at which a run stops, None to run the whole simulation_time.
+    :param max_replications: Replications added when a run ends without reaching the precision. They stop once the
+                             network throughput across the replications reaches it.
+    :param warmup: Remove the start-up transient detected with MSER-5 from the statistics.
+    :param export: Directory the runs are exported to, in a seed_<replication seed> subdirectory each.
+    :return: List of (replication, replication seed, measured seconds, warm-up slot, converged, node statistics).
+    """
+    # The first replication keeps the seed of the point, the others are spawned from it
+    replication_seeds = [seed] + [int(child.generate_state(1)[0])
+                                  for child in np.random.SeedSequence(seed).spawn(max_replications - 1)]
+    replications = []
+    throughputs = []
+    for replication, replication_seed in enumerate(replication_seeds):
+        network = build_network(sim_params, test_params, seed=replication_seed)
+        if precision is not None:
+            network.batch_means = BatchMeans(batch_slots, precision, truncate_warmup=warmup)
+        if warmup:
+            network.warmup = WarmupDetector()
+        network.run(report=False)
+
+        statistics = network.get_statistics()
+        converged = network.batch_means is not None and network.batch_means.converged
+        measured_time = next((node.measured_time for node in network.nodes if hasattr(node, 'measured_time')),
+                              sim_params['simulation_time'])
+        warmup_slot = network.warmup.truncation_slot if warmup else 0
+        if export is not None:
+            export_run(network, os.path.join(export, f"seed_{replication_seed}"),
+                       {'seed': replication_seed, 'replication': replication, 'test_params': test_params})
+        replications.append((replication, replication_seed, measured_time, warmup_slot, converged, statistics))
+
+        throughputs.append(sum(row['throughput_kbps'] for row in statistics if row['type'] == 'TX'))
+        if precision is None or converged:
+            break
+        width = relative_half_width(throughputs)
+        if width is not None and width <= precision:
+            break
+    return replications
+
+def point_seed(seed, point):
+    """
+    Returns the seed of a grid point, spawned from the root seed with a key derived from the point values.
+    A point keeps its seed when the grid around it grows, so its cached results stay valid.
+    """
+    spawn_key = (zlib.crc32(json.dumps(point, sort_keys=True).encode()),)
+    return int(np.random.SeedSequence(seed, spawn_key=spawn_key).generate_state(1)[0])
+
+def run_sweep(test_params, grid, seed=0, max_workers=None, precision=None, max_replications=1, warmup=False,
+              cache=None, export=None):
+    """
+    Runs every combination of the grid on a process pool.
+    :param test_params: The test parameters the grid is applied on top of.
+    :param grid: Dictionary of parameter name -> list of values. The "tx_nodes" entry is the number of Tx nodes
+                 of a single collision domain topology that replaces the test topology.
+    :param seed: Root seed, every grid point gets its own seed spawned from it.
+    :param max_workers: Number of worker processes, defaults to the number of CPUs.
+    :param precision: Relative confidence interval width at which runs stop, see run_point.
+    :param max_replications: Maximum number of replications of a grid point.
+    :param warmup: Remove the start-up transient from the statistics of every run.
+    :param cache: Optional ResultCache, only the points missing from it are simulated.
+    :param export: Optional directory the simulated runs are exported to, cached points are not exported again.
+    :return: List of rows, one per node, replication and grid point.
+    """
+    check_grid(grid)
+    points = expand_grid(grid)
+    options = {'precision': precision, 'max_replications': max_replications, 'warmup': warmup}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        keys = []
+        for point in points:
+            sim_params = load_sim_params(test_params)
+            point_test_params = test_params
+            for key, value in point.items():
+                if key == 'tx_nodes':
+                    point_test_params = single_domain_topology(value)
+                else:
+                    sim_params[key] = value
+            seed_of_point = point_seed(seed, point)
+            key = cache_key(sim_params, point_test_params, seed_of_point, options) if cache is not None else None
+            cached = cache.get(key) if cache is not None else None
+            keys.append(key)
+            if cached is not None:
+                futures.append(cached[0]['replications'])
+            else:
+                futures.append(executor.submit(run_point, sim_params, point_test_params, seed_of_point,
+                                               precision, max_replications, warmup=warmup, export=export))
+
+        results = []
+        for point, key, future in zip(points, keys, futures):
+            if isinstance(future, list):
+                replications = future
+            else:
+                replications = future.result()
+                if cache is not None:
+                    cache.put(key, {'replications': replications})
+            for replication, replication_seed, measured_time, warmup_slot, converged, statistics in replications:
+                for row in statistics:
+                    results.append({**point, 'seed': replication_seed, 'replication': replication,
+                                    'measured_time_s': measured_time, 'warmup_slot': warmup_slot,
+                                    'converged': converged, **row})
+    return results
+
+def write_results(results, file_name):
+    """
+    Writes the results table to a CSV file.
+    """
+    fieldnames = []
+    for row in results:
+        fieldnames.extend(key for key in row if key not in fieldnames)
+
+    log_dir = os.path.dirname(file_name)
+    if log_dir and not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    with open(file_name, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(results)
+
+def parse_values(text):
+    """
+    Parses a comma separated list of JSON values, e.g. "8,16" or "false,true".
+    """
+    return [json.loads(value) for value in text.split(',')]
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the network simulation over a grid of parameters.')
+    parser.add_argument('test_file', type=str, help='Path to the test parameters JSON file', nargs='?')
+    parser.add_argument('--grid', action='append', default=[], metavar='KEY=V1,V2',
+                        help='Simulation parameter and its values, can be repeated')
+    parser.add_argument('--nodes', type=parse_values, help='Numbers of Tx nodes in a single collision domain')
+    parser.add_argument('--seed', type=int, default=0, help='Root seed of the sweep')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--precision', type=float, default=None, metavar='REL',
+                        help='Stop every run once the 95%% confidence intervals of its metrics are within REL of their mean')
+    parser.add_argument('--max-replications', type=int, default=1,
+                        help='Replications of the grid points whose run does not reach --precision')
+    parser.add_argument('--warmup', action='store_true',
+                        help='Remove the start-up transient detected with MSER-5 from the statistics of every run')
+    parser.add_argument('--cache', action='store_true', help='Only simulate the grid points missing from the result cache')
+    parser.add_argument('--cache-dir', type=str, default='sim/output/cache', help='Directory of the result cache')
+    parser.add_argument('--output', type=str, default='sim/output/sweep_results.csv', help='CSV file for the results table')
+    parser.add_argument('--export', type=str, default=None, metavar='DIR',
+                        help='Export the statistics and histories of every simulated run to DIR/seed_<seed>')
+
+    args = parser.parse_args()
+
+    if args.test_file is None:
+        args.test_file = 'hw2_1'
+
+    args.test_file = os.path.join('sim/tst', args.test_file + '.json')
+    if not os.path.exists(args.test_file):
+        parser.error(f"The test file {args.test_file} does not exist")
+
+    grid = {}
+    for entry in args.grid:
+        key, _, values = entry.partition('=')
+        if not values:
+            parser.error(f"Invalid grid entry {entry}, expected KEY=V1,V2")
+        grid[key] = parse_values(values)
+    if args.nodes:
+        grid['tx_nodes'] = args.nodes
+    try:
+        check_grid(grid)
+    except ValueError as error:
+        parser.error(str(error))
+
+    results = run_sweep(load_parameters(args.test_file), grid, args.seed, args.workers,
+                        args.precision, args.max_replications, args.warmup,
+                        ResultCache(args.cache_dir) if args.cache else None, args.export)
+    write_results(results, args.output)
+    print(f"Wrote {len(results)} rows to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+batch_means.py
+
+Description:
+    The batch_means module decides when a run has simulated enough to estimate its metrics with a requested precision.
+    The run is cut into batches of a fixed number of slots. The network throughput and the AP collisions of every batch
+    are treated as samples of their steady-state mean, and the confidence interval of that mean shrinks as batches add up.
+
+Responsibilities:
+    - Records the throughput and collisions of every batch from the node counters.
+    - Reports when the confidence interval of every metric is narrower than the requested relative width.
+    - Optionally leaves the batches of the start-up transient, detected with MSER, out of the confidence intervals.
+
+Usage:
+    - network.batch_means = BatchMeans(batch_slots=20000, relative_precision=0.05) before network.run().
+    - Network.run stops at the end of the first batch that meets the precision.
+"""
+# batch_means.py
+from math import sqrt
+from src.csma_ca_ap import CsmaCaAp
+from src.csma_ca_tx import CsmaCaTx
+from src.warmup import mser_truncation
+
+METRICS = ("throughput_kbps", "collisions")
+
+
+def relative_half_width(samples, z=1.96):
+    """
+    Returns the half width of the normal confidence interval of the mean of the samples, relative to the mean.
+    :return: 0 when every sample is 0, None with fewer than two samples or a mean of 0.
+    """
+    count = len(samples)
+    if count < 2:
+        return None
+    mean = sum(samples) / count
+    variance = sum((sample - mean) ** 2 for sample in samples) / (count - 1)
+    if mean == 0:
+        return 0.0 if variance == 0 else None
+    return z * sqrt(variance / count) / abs(mean)
+
+
+class BatchMeans:
+    def __init__(self, batch_slots=20000, relative_precision=0.05, z=1.96, min_batches=10, truncate_warmup=False):
+        """
+        :param batch_slots: Length of a batch in slots, long enough for consecutive batches to be nearly independent.
+        :param relative_precision: Target half width of the confidence intervals, relative to the mean.
+        :param z: Quantile of the normal distribution for the confidence level, 1.96 for 95%.
+        :param min_batches: Number of batches before the precision is checked, after the warm-up if it is truncated.
+        :param truncate_warmup: Only use the batches after the MSER truncation point.
+        """
+        self.batch_slots = batch_slots
+        self.relative_precision = relative_precision
+        self.z = z
+        self.min_batches = min_batches
+        self.batches = {metric: [] for metric in METRICS}
+        self.truncate_warmup = truncate_warmup
+        self.warmup_batches = 0
+        self.converged = False
+        self._next_boundary = batch_slots
+        self._last_counts = (0, 0)
+
+    def update(self, current_slot, nodes):
+        """
+        Closes the batches that ended before the current slot and checks the precision.
+        :param current_slot: The slot reached by Network.run.
+        :param nodes: The nodes of the network.
+        :return: True once every metric reached the requested precision.
+        """
+        if current_slot < self._next_boundary:
+            return False
+
+        successes = sum(node.successful_transmissions for node in nodes if isinstance(node, CsmaCaTx))
+        collisions = sum(node.collisions for node in nodes if isinstance(node, CsmaCaAp))
+        tx_node = next((node for node in nodes if isinstance(node, CsmaCaTx)), None)
+        batch_time = self.batch_slots * tx_node.params['slot_duration'] if tx_node is not None else 1
+
+        # Nothing happens between the boundaries a single step jumps over, they close as empty batches
+        new_successes = successes - self._last_counts[0]
+        new_collisions = collisions - self._last_counts[1]
+        while self._next_boundary <= current_slot:
+            packet_bits = new_successes * tx_node.packet_size if tx_node is not None else 0
+            self.batches["throughput_kbps"].append(packet_bits / batch_time / 10**3)
+            self.batches["collisions"].append(new_collisions)
+            new_successes = new_collisions = 0
+            self._next_boundary += self.batch_slots
+        self._last_counts = (successes, collisions)
+
+        # The precision is only checked from min_batches batches on, so is the MSER truncation that it depends on
+        if len(self.batches["throughput_kbps"]) < self.min_batches:
+            return False
+        if self.truncate_warmup:
+            self.warmup_batches = mser_truncation(self.batches["throughput_kbps"], batch_size=1)
+        if len(self.batches["throughput_kbps"]) - self.warmup_batches >= self.min_batches:
+            widths = [relative_half_width(samples[self.warmup_batches:], self.z) for samples in self.batches.values()]
+            self.converged = all(width is not None and width <= self.relative_precision for width in widths)
+        return self.converged
+
+    def summary(self):
+        """
+        Returns the mean and relative confidence interval half width of every metric.
+        """
+        warmup_batches = self.warmup_batches
+        if self.truncate_warmup and len(self.batches["throughput_kbps"]) < self.min_batches:
+            # The run ended before the truncation was ever searched
+            warmup_batches = mser_truncation(self.batches["throughput_kbps"], batch_size=1)
+        summary = {'batches': len(self.batches["throughput_kbps"]), 'batch_slots': self.batch_slots,
+                   'warmup_batches': warmup_batches, 'converged': self.converged}
+        for metric, samples in self.batches.items():
+            samples = samples[warmup_batches:]
+            summary[metric] = sum(samples) / len(samples) if samples else None
+            summary[metric + '_relative_half_width'] = relative_half_width(samples, self.z)
+        return summary
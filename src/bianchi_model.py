@@ -0,0 +1,97 @@
+"""
+bianchi_model.py
+
+Description:
+    The bianchi_model module estimates the saturation throughput of a single collision domain with Bianchi's
+    Markov chain model of the 802.11 DCF, without simulating anything.
+    Every station always has a packet to send and picks its backoff uniformly in [0, min(CWmax, 2^i * CW0)] after i
+    collisions, as CsmaCaTx.set_backoff does. A success and a collision both keep the medium busy for the frame,
+    SIFS, the ACK or COLLISION response and DIFS.
+
+Responsibilities:
+    - Solves the fixed point between the transmission probability tau and the collision probability p.
+    - Converts it into the throughput reported by CsmaCaTx.print_statistics and the collisions counted by CsmaCaAp.
+
+Usage:
+    - bianchi_saturation(sim_params, stations) with the parameters of sim/settings/settings.json.
+"""
+# bianchi_model.py
+from math import ceil, expm1, log1p
+
+
+def backoff_windows(sim_params):
+    """
+    Returns the contention windows of the backoff stages, the last one being CWmax.
+    """
+    windows = [sim_params['CW0']]
+    while windows[-1] < sim_params['CWmax']:
+        windows.append(min(sim_params['CWmax'], 2 * windows[-1]))
+    return windows
+
+
+def transmission_probability(collision_probability, windows):
+    """
+    Returns the probability tau that a saturated station transmits in a backoff slot.
+    A station reaches stage i with probability p^i and stays in the last stage until it succeeds. It spends one slot
+    transmitting and on average CW_i / 2 slots counting down in every stage it reaches.
+    The visits are counted per attempt, i.e. multiplied by 1 - p, so the last stage never divides by 1 - p and p = 1
+    gives the window of the last stage.
+    """
+    p = collision_probability
+    last_stage = len(windows) - 1
+    stage_visits = [(1 - p) * p ** stage for stage in range(last_stage)] + [p ** last_stage]
+    slots = sum(visits * (1 + window / 2) for visits, window in zip(stage_visits, windows))
+    return 1 / slots
+
+
+def collision_probability(tau, stations):
+    """
+    Returns the probability 1 - (1 - tau)^(n - 1) that one of the other stations transmits in the same slot, computed
+    without rounding to 1 when tau is large or the stations many.
+    """
+    return -expm1((stations - 1) * log1p(-tau))
+
+
+def bianchi_saturation(sim_params, stations, tolerance=1e-12):
+    """
+    Estimates the saturation operating point of a collision domain.
+    :param sim_params: The simulation parameters, see sim/settings/settings.json.
+    :param stations: Number of Tx stations sharing the collision domain with the AP.
+    :param tolerance: Precision of the fixed point on tau.
+    :return: Dictionary with tau, the collision probability and the throughput and collision rates.
+    """
+    windows = backoff_windows(sim_params)
+    packet_size = sim_params['data_frame_size'] * 8
+    slot_duration = sim_params['slot_duration']
+    frame_length = ceil(packet_size / (sim_params['bandwidth'] * slot_duration))
+    busy_slots = frame_length + sim_params['SIFS_size'] + sim_params['ACK_size'] + sim_params['DIFS_size']
+
+    # tau decreases with p while p = 1 - (1 - tau)^(n - 1) increases with tau, bisect on the difference. tau never
+    # exceeds its value without collisions, 2 / (CW0 + 2), which keeps p away from 1
+    low, high = 0.0, transmission_probability(0.0, windows)
+    while high - low > tolerance:
+        tau = (low + high) / 2
+        if transmission_probability(collision_probability(tau, stations), windows) > tau:
+            low = tau
+        else:
+            high = tau
+    tau = (low + high) / 2
+    p = collision_probability(tau, stations)
+
+    # Probability that a slot holds a transmission or a success, and the frames the AP counts as collisions in it:
+    # every frame of a slot but the first one
+    transmission = -expm1(stations * log1p(-tau))
+    success = stations * tau * (1 - tau) ** (stations - 1)
+    collided_frames = max(0.0, stations * tau - transmission)
+    mean_slot_seconds = ((1 - transmission) + transmission * busy_slots) * slot_duration
+
+    successes_per_second = success / mean_slot_seconds
+    return {
+        'stations': stations,
+        'tau': tau,
+        'collision_probability': p,
+        'successes_per_second': successes_per_second,
+        'collisions_per_second': collided_frames / mean_slot_seconds,
+        'throughput_kbps': successes_per_second * packet_size / 10**3,
+        'throughput_per_station_kbps': successes_per_second * packet_size / 10**3 / stations,
+    }
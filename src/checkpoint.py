@@ -0,0 +1,54 @@
+"""
+checkpoint.py
+
+Description:
+    The checkpoint module saves the complete state of a Network run to a compact binary snapshot and restores it.
+    The snapshot holds the network with its nodes, scheduler, pending arrivals, recorded histories and collected
+    statistics, the progress of Network.run, and the state of the global random generators.
+
+Responsibilities:
+    - Writes zlib compressed pickles atomically, so a run killed while saving keeps its previous checkpoint.
+    - Restores the network and the global random generators, Network.run then continues where it stopped.
+
+Usage:
+    - network.run(checkpoint='run.ckpt', checkpoint_interval=600, time_budget=3600) saves periodically and on budget.
+    - network = load_checkpoint('run.ckpt'); network.run(checkpoint='run.ckpt') resumes the run.
+"""
+# checkpoint.py
+import os
+import pickle
+import random
+import zlib
+import numpy as np
+
+CHECKPOINT_MAGIC = b"CSMACKPT1\n"
+
+
+def save_checkpoint(network, file_name):
+    """
+    Saves the network and the global random generators to file_name.
+    """
+    state = {'network': network, 'random': random.getstate(), 'numpy': np.random.get_state()}
+    payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 6)
+
+    directory = os.path.dirname(file_name)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    temporary = f"{file_name}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as file:
+        file.write(CHECKPOINT_MAGIC)
+        file.write(payload)
+    os.replace(temporary, file_name)
+
+
+def load_checkpoint(file_name):
+    """
+    Restores the global random generators saved in file_name and returns its network.
+    """
+    with open(file_name, 'rb') as file:
+        if file.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise ValueError(f"{file_name} is not a simulation checkpoint")
+        state = pickle.loads(zlib.decompress(file.read()))
+    random.setstate(state['random'])
+    np.random.set_state(state['numpy'])
+    return state['network']
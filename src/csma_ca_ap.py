@@ -7,7 +7,7 @@ Description:
 
 Responsibilities:
     - Sends CTS frames in response to RTS frames from transmitting stations.
-    - Sends ACK frames in response to data frames from transmitting stations.
+    - Sends ACK frames in response to data frames from transmitting stations, never to the frames of other APs.
     - Handles collisions and waits for the medium to become idle.
 
 Usage:
@@ -15,31 +15,33 @@ Usage:
 """
 
 # csma_ca_tx.py
+from collections import deque
 from utility.logger_config import logger
 from src.proj_data_classes import Event, NodeType
+from src.event_history import EventHistory, EVENT_CODES
 class CsmaCaAp:
     def __init__(self, id, collision_domain, params, visualizer=None):
-        logger.debug("CsmaCaTx instance created.")
+        logger.debug("CsmaCaAp instance created.")
         self.ID = id
         self.CD = collision_domain
         self.ACK = params['ACK_size']
         self.SIFS = params['SIFS_size']
         self.PARM = params
 
-        self.respond_list = []
+        self.respond_queue = deque()  # Responses to the received DATA frames, oldest first
         self.event = None
         
         self.collisions = 0
 
         # Histor of for the Sender
-        self.history = []
+        self.history = EventHistory(params.get('history_mode', 'full'), params.get('history_size', 4096))
         self.visualizer = visualizer
 
     def log_and_notify(self, timestamp, event_name, duration):
             """
             Appends event to history log and notifies observer.
             """
-            self.history.append((timestamp, event_name, duration))
+            self.history.append(timestamp, EVENT_CODES[event_name], duration)
             if self.visualizer is not None:
                 self.visualizer.plot_event(self.ID, timestamp, event_name, duration)
                 
@@ -53,23 +55,26 @@ class CsmaCaAp:
         message = "ACK" if self.event.data_type == NodeType.AP else "COLLISION"
         self.log_and_notify(self.event.timestamp, message, self.ACK)
         self.event = None
-        self.respond_list.pop(0)
+        self.respond_queue.popleft()
 
     def receive_event(self, event):
         """
         Receives a BroadcastEvent and processes it accordingly.
         :param event: The event to be processed.
         """
+        # Only DATA frames are answered. The ACK and COLLISION frames of another AP in the same domain are not addressed
+        # to this AP, and answering them makes the two APs reply to each other's responses until the end of the run
+        if event.data_type != NodeType.TX:
+            return
+
         # Collision Occurs
-        if self.respond_list:
+        if self.respond_queue:
             self.collisions += 1
-            for i in self.respond_list:
-                i["response"].data_type = NodeType.COLLISION
-            self.respond_list.append({"recieved" : event,
-                                      "response" : Event(NodeType.COLLISION, self.ID, event.timestamp + event.duration + self.SIFS, self.ACK, event.nav)})
+            for response in self.respond_queue:
+                response.data_type = NodeType.COLLISION
+            self.respond_queue.append(Event(NodeType.COLLISION, self.ID, event.timestamp + event.duration + self.SIFS, self.ACK, event.nav))
         else:
-            self.respond_list.append({"recieved" : event,
-                                      "response" : Event(NodeType.AP, self.ID, event.timestamp + event.duration + self.SIFS, self.ACK, event.nav)})
+            self.respond_queue.append(Event(NodeType.AP, self.ID, event.timestamp + event.duration + self.SIFS, self.ACK, event.nav))
    
     
     def declare_event(self, timestamp):
@@ -78,11 +83,17 @@ class CsmaCaAp:
         :return: The next event from the node.
         """
         # An Event is already trying to occur
-        if self.respond_list:
-            self.event = self.respond_list[0]["response"]
+        if self.respond_queue:
+            self.event = self.respond_queue[0]
             return self.event
         else:
             return None
         
+    def get_statistics(self):
+        """
+        Returns the statistics of the node as a dictionary.
+        """
+        return {'node': self.ID, 'type': 'AP', 'collisions': self.collisions}
+
     def print_statistics(self):
         print(f"AP: {self.ID} Collisions: {self.collisions}")
\ No newline at end of file
@@ -17,6 +17,8 @@ Usage:
 # csma_ca_tx.py
 from utility.logger_config import logger
 from src.proj_data_classes import Event, NodeType
+from src.event_history import EventHistory, EVENT_CODES
+from utility.poisson_traffic import as_traffic_source
 from enum import Enum, auto
 import random
 from math import ceil
@@ -25,7 +27,7 @@ class TX_STATE(Enum):
     WAITING_FOR_ACK = auto()
     TRANSMITTING = auto()
 class CsmaCaTx:
-    def __init__(self, id, collision_domain, params, packet_arrival_times, visualizer=None):
+    def __init__(self, id, collision_domain, params, packet_arrival_times, visualizer=None, rng=None):
         logger.debug("CsmaCaTx instance created.")
         
         # Constants for Sender
@@ -36,7 +38,7 @@ class CsmaCaTx:
         self.ACK = params['ACK_size']
         self.CW_MIN = params['CW0']
         self.CW_MAX = params['CWmax']
-        self.TX_ARRIVAL_LIST = packet_arrival_times
+        self.TX_ARRIVALS = as_traffic_source(packet_arrival_times)
         self.params = params
         
         bandwidth = params['bandwidth']
@@ -53,30 +55,45 @@ class CsmaCaTx:
         self.collision_cnt = 0    
         self.package_end = 0            
         self.event = None
+        self.packet_arrival = 0  # Arrival slot of the packet in contention
+        self.access_start = 0  # Slot the packet reached the head of the queue and started contending
         
         self.successful_transmissions = 0
+        self.failed_transmissions = 0  # Transmissions that collided or were not acknowledged
+        self.measured_time = params['simulation_time']  # Seconds the throughput is rated over
         
         # Histor of for the Sender
-        self.history = []
+        self.history = EventHistory(params.get('history_mode', 'full'), params.get('history_size', 4096))
         self.visualizer = visualizer
 
+        # Backoff stream with a randint(low, high) method, e.g. the BackoffStream of utility/random_streams.py.
+        # None draws from the global random module; the module itself is not stored so the node stays picklable.
+        self.rng = rng
+
     def log_and_notify(self, timestamp, event_name, duration):
             """
             Appends event to history log and notifies observer.
             """
-            self.history.append((timestamp, event_name, duration))
+            self.history.append(timestamp, EVENT_CODES[event_name], duration)
             if self.visualizer is not None:
                 self.visualizer.plot_event(self.ID, timestamp, event_name, duration)
 
 
     def set_event(self, timestamp):
+        if self.event is not None and self.state == TX_STATE.TRANSMITTING:
+            # The pending event was never broadcast, so only this node and the scheduler hold it: declare it again in
+            # place. A broadcast event may still be read by other nodes, the retry gets a new one.
+            self.event.timestamp = timestamp
+            self.event.nav = self.package_end
+            return
         self.event = Event(NodeType.TX, self.ID, timestamp, self.PACKAGE_LENGTH, self.package_end)
     
     def set_backoff(self):
         """
         Randomly selects backoff based on the current collision count.
         """
-        return random.randint(0, min(self.CW_MAX, 2 ** self.collision_cnt * self.CW_MIN))
+        rng = random if self.rng is None else self.rng
+        return rng.randint(0, min(self.CW_MAX, 2 ** self.collision_cnt * self.CW_MIN))
     
     def determine_timestamps(self, event_timestamp):
         """
@@ -117,6 +134,7 @@ class CsmaCaTx:
         :param event: The event to be processed.
         """
         self.collision_cnt += 1
+        self.failed_transmissions += 1
         
         # Collision Detected
         self.backoff = self.set_backoff()
@@ -138,8 +156,11 @@ class CsmaCaTx:
 
         # Event time beyond expected ACK slot (Collision)
         if event.timestamp > self.expected_ack_slot:
-            logger.error(f"TX_NODE_{self.ID}: Did not receive ACK from AP in time. Simulation Failed.")
-            quit()
+            # The ACK never came, e.g. the AP was answering a hidden node. Retry once the medium is free again.
+            logger.debug("TX_NODE_%s: Did not receive ACK from AP in time.", self.ID)
+            self.package_end = max(self.package_end, event.nav)
+            self.collision_process()
+            self.state = TX_STATE.TRANSMITTING
         elif event.data_type == NodeType.COLLISION or event.timestamp != self.expected_ack_slot:
             # COLLISION
             self.collision_process()
@@ -151,7 +172,7 @@ class CsmaCaTx:
             self.event = None
             self.state = TX_STATE.TRANSMITTING
         else:
-            logger.err(f"TX_NODE_{self.ID}: Invalid Event Type: {event.data_type}. Simulation Failed.")
+            logger.error(f"TX_NODE_{self.ID}: Invalid Event Type: {event.data_type}. Simulation Failed.")
             quit()
             
     
@@ -209,12 +230,13 @@ class CsmaCaTx:
             return self.event
         
         # If an event is not already made, and there are arrivals
-        elif self.TX_ARRIVAL_LIST:
+        elif self.TX_ARRIVALS:
             # New Packet. Retrieve next packet arrival time
-            event_arr = self.TX_ARRIVAL_LIST.pop(0)
+            event_arr = self.TX_ARRIVALS.pop()
             
             # If the Packet arrival time is before the current timestamp, set the event timestamp to the current timestamp
             event_timestamp = event_arr if event_arr > timestamp else timestamp
+            self.packet_arrival, self.access_start = event_arr, event_timestamp
        
             # Random Backoff
             self.backoff = self.set_backoff()
@@ -228,6 +250,18 @@ class CsmaCaTx:
         else:
             return None
         
+    def get_statistics(self):
+        """
+        Returns the statistics of the node as a dictionary.
+        """
+        return {
+            'node': self.ID,
+            'type': 'TX',
+            'successful_transmissions': self.successful_transmissions,
+            'throughput_kbps': self.successful_transmissions * self.packet_size / self.measured_time / 10**3,
+        }
+
     def print_statistics(self):
-        print(f"TX: {self.ID}: Successful Transmission: {self.successful_transmissions}")
-        print(f"TX: {self.ID}: Throughput: {self.successful_transmissions * self.packet_size / self.params['simulation_time'] / 10**3:.2f} Kbps")
\ No newline at end of file
+        statistics = self.get_statistics()
+        print(f"TX: {self.ID}: Successful Transmission: {statistics['successful_transmissions']}")
+        print(f"TX: {self.ID}: Throughput: {statistics['throughput_kbps']:.2f} Kbps")
\ No newline at end of file
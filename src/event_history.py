@@ -0,0 +1,129 @@
+"""
+event_history.py
+
+Description:
+    The event_history module records the DIFS/DATA/SIFS/ACK/COLLISION history of a node in typed NumPy arrays.
+    Events are stored as int64 timestamps, uint8 event codes and int32 durations in chunks. The chunks start small and
+    double up to a cap, so the many nodes of a large topology that only record a few events stay small, while a long
+    history still grows one large chunk at a time. The ring buffer grows the same way up to its length.
+
+Responsibilities:
+    - Records events in one of three modes: "off", "ring" (the last N events) or "full".
+    - Returns the recorded history as a NumPy structured array.
+
+Usage:
+    - Every node owns an EventHistory configured by the "history_mode" and "history_size" simulation parameters.
+"""
+# event_history.py
+import numpy as np
+
+EVENT_NAMES = ("DIFS", "DATA", "SIFS", "ACK", "COLLISION")
+EVENT_CODES = {name: code for code, name in enumerate(EVENT_NAMES)}
+HISTORY_DTYPE = np.dtype([('timestamp', np.int64), ('event', np.uint8), ('duration', np.int32)])
+HISTORY_MODES = ("off", "ring", "full")
+FIRST_CHUNK = 64  # Events of the first chunk
+MAX_CHUNK = 4096  # Events of the largest chunks of the full mode
+
+
+class EventHistory:
+    def __init__(self, mode="full", size=4096, first_chunk=FIRST_CHUNK, max_chunk=MAX_CHUNK):
+        """
+        :param mode: "off" records nothing, "ring" keeps the last size events, "full" keeps every event.
+        :param size: Length of the ring buffer.
+        :param first_chunk: Events of the first chunk, every next chunk is twice as large.
+        :param max_chunk: Events of the largest chunks in full mode.
+        """
+        if mode not in HISTORY_MODES:
+            raise ValueError(f"Invalid history mode {mode}. Mode must be one of {', '.join(HISTORY_MODES)}.")
+        self.mode = mode
+        self.size = size
+        self.first_chunk = first_chunk
+        self.max_chunk = max_chunk
+        self.count = 0  # Number of events recorded since the start, including the ones dropped by the ring buffer
+        self._chunks = []
+        self._chunk = None
+        self._chunk_size = 0  # Capacity of the current chunk, the first event allocates the first one
+        self._position = 0
+
+    def __len__(self):
+        if self.mode == "ring":
+            return min(self.count, self.size)
+        return self.count
+
+    def _next_chunk(self):
+        """
+        Makes room for the next event.
+        :return: False if the event must not be recorded.
+        """
+        if self.mode == "off":
+            return False
+        if self.mode == "ring":
+            if self._chunk_size == self.size:
+                # The ring is full, overwrite the oldest event
+                self._position = 0
+                return True
+            # Not wrapped yet: the events are in order at the start of the buffer, move them to a larger one
+            capacity = min(self.size, max(self.first_chunk, 2 * self._chunk_size))
+            chunk = self._allocate(capacity)
+            if self._chunk is not None:
+                for column, old_column in zip(chunk, self._chunk):
+                    column[:self._position] = old_column[:self._position]
+            self._chunk, self._chunks, self._chunk_size = chunk, [chunk], capacity
+            return True
+        capacity = min(self.max_chunk, max(self.first_chunk, 2 * self._chunk_size))
+        self._chunk = self._allocate(capacity)
+        self._chunks.append(self._chunk)
+        self._chunk_size = capacity
+        self._position = 0
+        return True
+
+    @staticmethod
+    def _allocate(capacity):
+        return np.empty(capacity, np.int64), np.empty(capacity, np.uint8), np.empty(capacity, np.int32)
+
+    def append(self, timestamp, event_code, duration):
+        """
+        Records an event.
+        :param timestamp: Slot at which the event starts.
+        :param event_code: Code of the event, see EVENT_CODES.
+        :param duration: Duration of the event in slots.
+        """
+        if self._position == self._chunk_size and not self._next_chunk():
+            return
+        timestamps, events, durations = self._chunk
+        position = self._position
+        timestamps[position] = timestamp
+        events[position] = event_code
+        durations[position] = duration
+        self._position = position + 1
+        self.count += 1
+
+    def to_array(self):
+        """
+        Returns the recorded events in chronological order of recording as a structured array of HISTORY_DTYPE.
+        """
+        history = np.empty(len(self), HISTORY_DTYPE)
+        if not self._chunks:
+            return history
+
+        if self.mode == "ring":
+            # Oldest events start right after the last written position once the buffer wrapped around
+            start = self._position if self.count > self.size else 0
+            order = np.roll(np.arange(len(self)), -start)
+            for field, column in zip(HISTORY_DTYPE.names, self._chunk):
+                history[field] = column[:len(self)][order]
+            return history
+
+        offset = 0
+        for chunk in self._chunks:
+            length = min(len(chunk[0]), self.count - offset)
+            for field, column in zip(HISTORY_DTYPE.names, chunk):
+                history[field][offset:offset + length] = column[:length]
+            offset += length
+        return history
+
+    def to_list(self):
+        """
+        Returns the recorded events as a list of (timestamp, event_name, duration) tuples.
+        """
+        return [(int(timestamp), EVENT_NAMES[event], int(duration)) for timestamp, event, duration in self.to_array()]
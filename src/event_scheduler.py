@@ -0,0 +1,86 @@
+"""
+event_scheduler.py
+
+Description:
+    The event_scheduler module keeps the pending events of every node in a binary heap ordered by timestamp.
+    Each node owns at most one scheduled entry; scheduling a new event for a node invalidates the previous one.
+
+Responsibilities:
+    - Pushes and invalidates the pending event of each node in O(log N).
+    - Pops all events that share the earliest timestamp, ordered by node index.
+    - Peeks at the earliest timestamp, so a run can stop before a given slot.
+
+Usage:
+    - The Network schedules the event declared by each node and pops the earliest events on every step.
+"""
+# event_scheduler.py
+import heapq
+
+
+class EventScheduler:
+    def __init__(self):
+        self._heap = []
+        # Node index -> live heap entry [timestamp, node_index, sequence, event]
+        self._pending = {}
+        self._sequence = 0  # Breaks ties between entries of a node, so events themselves are never compared
+
+    def __len__(self):
+        return len(self._pending)
+
+    def schedule(self, node_index, event):
+        """
+        Schedules the pending event of a node, replacing any event previously scheduled for it.
+        :param node_index: Index of the node in the network.
+        :param event: The event declared by the node.
+        """
+        self._sequence += 1
+        entry = [event.timestamp, node_index, self._sequence, event]
+        self._pending[node_index] = entry
+        heapq.heappush(self._heap, entry)
+
+    def invalidate(self, node_index):
+        """
+        Removes the pending event of a node. The heap entry is discarded lazily when it reaches the top.
+        :param node_index: Index of the node in the network.
+        """
+        self._pending.pop(node_index, None)
+
+    def is_scheduled(self, node_index, event):
+        """
+        Checks if the given event is the one currently scheduled for the node, at the same timestamp.
+        :param node_index: Index of the node in the network.
+        :param event: The event declared by the node.
+        """
+        entry = self._pending.get(node_index)
+        return entry is not None and entry[3] is event and entry[0] == event.timestamp
+
+    def peek_timestamp(self):
+        """
+        Returns the earliest scheduled timestamp without removing its events, None if nothing is scheduled.
+        """
+        heap = self._heap
+        while heap and self._pending.get(heap[0][1]) is not heap[0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_earliest(self):
+        """
+        Removes and returns every pending event that has the earliest timestamp.
+        :return: List of events ordered by node index, empty if nothing is scheduled.
+        """
+        heap = self._heap
+        pending = self._pending
+        earliest_events = []
+        earliest_timestamp = None
+        while heap:
+            entry = heap[0]
+            if pending.get(entry[1]) is not entry:
+                heapq.heappop(heap)
+                continue
+            if earliest_events and entry[0] != earliest_timestamp:
+                break
+            earliest_timestamp = entry[0]
+            heapq.heappop(heap)
+            del pending[entry[1]]
+            earliest_events.append(entry[3])
+        return earliest_events
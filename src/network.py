@@ -1,15 +1,37 @@
 # network.py
 from utility.logger_config import logger
+import random
 import time
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+from time import perf_counter
+import numpy as np
 from src.proj_data_classes import Event
 from src.csma_ca_ap import CsmaCaAp
 from src.csma_ca_tx import CsmaCaTx
+from src.event_scheduler import EventScheduler
+from src.checkpoint import save_checkpoint
 
 class Network:
     def __init__(self, sim_params):
         logger.debug("Network instance created.")
+        self.sim_params = sim_params
         self.nodes = []
+        self.node_index = {}  # Node ID -> position in self.nodes
+        self.collision_domains = {}  # Collision domain ID -> positions of its nodes
+        self.neighbours = []  # Position -> positions of the nodes sharing a collision domain with it
+        self.medium_free = []  # Position -> slot at which the node last sensed the medium to be free
+        self.scheduler = EventScheduler()
+        self.events_processed = 0  # Number of events broadcast by Network.run
+        self.profiler = None  # Optional NetworkProfiler, see src/profiler.py
+        self.batch_means = None  # Optional BatchMeans stopping the run once its metrics are precise enough
+        self.warmup = None  # Optional WarmupDetector removing the start-up transient from the statistics
+        self.metrics = None  # Optional StreamingMetrics taking windowed snapshots of the run, see src/streaming_metrics.py
         self.slot_limit = int(sim_params['simulation_time']/(sim_params['slot_duration']))
+        # Progress of Network.run, kept on the network so a checkpointed run can resume
+        self.current_slot = 0
+        self.updated_nodes = None  # Positions of the nodes to poll before the next step, None for all of them
+        self.finished = False
         pass
         # ... (other methods and attributes) ...
         
@@ -19,7 +41,20 @@ class Network:
         :param node: The node to be added, can be of type CsmaCaTx or CsmaCaAp.
         """
         if isinstance(node, CsmaCaTx) or isinstance(node, CsmaCaAp):
+            index = len(self.nodes)
+            self.node_index[node.ID] = index
             self.nodes.append(node)
+            self.medium_free.append(0)
+
+            # Link the node with every node already in one of its collision domains
+            neighbours = set()
+            for collision_id in node.CD:
+                members = self.collision_domains.setdefault(collision_id, [])
+                neighbours.update(members)
+                members.append(index)
+            for neighbour in neighbours:
+                self.neighbours[neighbour].append(index)
+            self.neighbours.append(sorted(neighbours))
         else:
             raise ValueError("Invalid node type. Node must be of type CsmaCaTx or CsmaCaAp.")
 
@@ -29,66 +64,237 @@ class Network:
         """
         logger.info("Network Structure:")
         
-        # Create a dictionary to store nodes for each collision domain
-        collision_domains = {}
-        
-        # Iterate over all nodes and add them to the corresponding collision domain in the dictionary
-        for node in self.nodes:
-            for collision_id in node.CD:
-                if collision_id not in collision_domains:
-                    collision_domains[collision_id] = {'tx_nodes': [], 'ap_nodes': []}
-                if isinstance(node, CsmaCaTx):
-                    collision_domains[collision_id]['tx_nodes'].append(node.ID)
-                elif isinstance(node, CsmaCaAp):
-                    collision_domains[collision_id]['ap_nodes'].append(node.ID)
-        
         # Log the nodes in each collision domain
-        for collision_id, nodes in collision_domains.items():
+        for collision_id, members in self.collision_domains.items():
+            tx_nodes = [self.nodes[index].ID for index in members if isinstance(self.nodes[index], CsmaCaTx)]
+            ap_nodes = [self.nodes[index].ID for index in members if isinstance(self.nodes[index], CsmaCaAp)]
             logger.info(f"Collision Domain ID: {collision_id}")
-            logger.info(f"  Tx Nodes: {', '.join(map(str, nodes['tx_nodes'])) if nodes['tx_nodes'] else 'None'}")
-            logger.info(f"  AP Nodes: {', '.join(map(str, nodes['ap_nodes'])) if nodes['ap_nodes'] else 'None'}")
+            logger.info(f"  Tx Nodes: {', '.join(map(str, tx_nodes)) if tx_nodes else 'None'}")
+            logger.info(f"  AP Nodes: {', '.join(map(str, ap_nodes)) if ap_nodes else 'None'}")
 
-    def run(self):
+    def run(self, report=True, checkpoint=None, checkpoint_interval=600, time_budget=None, until=None):
         """
-        Runs the simulation for all collision domains in the network.
+        Runs the simulation for all collision domains in the network, or resumes it where it stopped.
+        :param report: Print the statistics of every node at the end of the run.
+        :param checkpoint: File the state of the run is periodically saved to, see src/checkpoint.py.
+        :param checkpoint_interval: Wall-clock seconds between two checkpoints.
+        :param time_budget: Wall-clock seconds after which the run stops cleanly, saving a checkpoint.
+        :param until: Pause before the first step at or after this slot, a later call continues the run.
+        :return: True when the simulation ended, False when the time budget or until interrupted it.
         """     
-        # set timeout to 120 seconds
-        timeout = 120
         start_time = time.time()
-        current_slot = 0
+        last_checkpoint = start_time
+        current_slot = self.current_slot
 
-        while current_slot < self.slot_limit:
-            nodes_w_events = []
-            for node in self.nodes:
-                if node.declare_event(current_slot) is not None:
-                    nodes_w_events.append(node.event)
-            if not nodes_w_events:
-                logger.error("No events to process. Ending simulation.")
-                quit()
-            earliest_timestamp = min(event.timestamp for event in nodes_w_events)
-            earliest_events = [event for event in nodes_w_events if event.timestamp == earliest_timestamp]
+        # Every node declares its first event at slot 0
+        updated_nodes = self.updated_nodes if self.updated_nodes is not None else range(len(self.nodes))
+
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start()
+
+        while current_slot < self.slot_limit and not self.finished:
+            if checkpoint is not None or time_budget is not None:
+                now = time.time()
+                if time_budget is not None and now - start_time > time_budget:
+                    self.current_slot, self.updated_nodes = current_slot, list(updated_nodes)
+                    if profiler is not None:
+                        profiler.stop()
+                    if checkpoint is not None:
+                        save_checkpoint(self, checkpoint)
+                    logger.info(f"Time budget reached at slot {current_slot}. Run interrupted.")
+                    return False
+                if checkpoint is not None and now - last_checkpoint > checkpoint_interval:
+                    self.current_slot, self.updated_nodes = current_slot, list(updated_nodes)
+                    save_checkpoint(self, checkpoint)
+                    last_checkpoint = now
+                    logger.info(f"Checkpoint saved at slot {current_slot}.")
+
+            if profiler is not None:
+                phase_start = perf_counter()
+
+            # Only nodes that broadcast or received an event can have a different pending event
+            for index in updated_nodes:
+                self.reschedule(index, self.medium_free[index])
+            if profiler is not None:
+                phase_start = profiler.lap("poll", phase_start)
+            if not self.scheduler:
+                logger.info("No events to process. Ending simulation.")
+                break
+            if until is not None and self.scheduler.peek_timestamp() >= until:
+                # Every node was just polled, the next call only has to pop the scheduled events
+                self.current_slot, self.updated_nodes = current_slot, []
+                if profiler is not None:
+                    profiler.stop()
+                return False
+            earliest_events = self.scheduler.pop_earliest()
+            self.events_processed += len(earliest_events)
+            if profiler is not None:
+                phase_start = profiler.lap("select", phase_start)
 
             # Inform nodes that they will be broadcasting
-            for event in earliest_events:
-                corresponding_node = next(node for node in self.nodes if node.ID == event.node_id)
-                corresponding_node.inform_broadcasting()
+            broadcasting = [self.node_index[event.node_id] for event in earliest_events]
+            senders = set(broadcasting)
+            for index in broadcasting:
+                self.nodes[index].inform_broadcasting()
+            if profiler is not None:
+                phase_start = profiler.lap("inform", phase_start)
 
-            # Inform other nodes of the event
-            for node in self.nodes:
-                if node.ID not in [event.node_id for event in earliest_events]:
-                    for event in earliest_events:
+            # Each event only reaches the nodes sharing a collision domain with its sender
+            heard_events = {}
+            for index, event in zip(broadcasting, earliest_events):
+                heard_events.setdefault(index, []).append(event)
+                for neighbour in self.neighbours[index]:
+                    heard_events.setdefault(neighbour, []).append(event)
+
+            # Inform other nodes of the event. Only the senders and the nodes that heard an event are polled on the next
+            # step, the pending events of every other node are still valid in the scheduler
+            updated_nodes = sorted(heard_events)
+            for index in updated_nodes:
+                events = heard_events[index]
+                if index not in senders:
+                    node = self.nodes[index]
+                    for event in events:
                         node.receive_event(event)
+                self.medium_free[index] = max(event.nav for event in events)
 
             current_slot = max([event.nav for event in earliest_events])  # Update current slot to the timestamp of the earliest event
 
-            # elapsed_time = time.time() - start_time
-            # if elapsed_time > timeout:
-            #     logger.error("Time limit reached. Ending simulation.")
-            #     break
-            
+            if profiler is not None:
+                profiler.lap("deliver", phase_start)
+                profiler.record_step(earliest_events, [self.nodes[index] for index in updated_nodes], current_slot)
+
+            if self.warmup is not None:
+                self.warmup.update(current_slot, self.nodes)
+            if self.metrics is not None:
+                self.metrics.update(current_slot, self.nodes, updated_nodes)
+            if self.batch_means is not None and self.batch_means.update(current_slot, self.nodes):
+                logger.info(f"Confidence target reached at slot {current_slot}. Ending simulation.")
+                # Throughputs are rated over the simulated time only
+                for node in self.nodes:
+                    if isinstance(node, CsmaCaTx):
+                        node.measured_time = current_slot * self.sim_params['slot_duration']
+                break
+
+        self.current_slot, self.updated_nodes = current_slot, []
+        self.finished = True
+        if profiler is not None:
+            profiler.stop()
+        if self.metrics is not None:
+            self.metrics.finish(current_slot)
+
+        if self.warmup is not None:
+            logger.info(f"Warm-up detected until slot {self.warmup.truncate(self.nodes)}, statistics start there.")
+
+        if report:
+            for node in self.nodes:
+                node.print_statistics()
+        return True
+
+    def connected_components(self):
+        """
+        Groups the nodes into components: sets of collision domains linked by the nodes they share.
+        Nodes of different components never hear each other, so each component can be simulated on its own.
+        :return: A list of components, each one the sorted positions of its nodes.
+        """
+        # Union-find over the collision domains, every node joins all of its domains
+        parent = {collision_id: collision_id for collision_id in self.collision_domains}
+
+        def find(collision_id):
+            while parent[collision_id] != collision_id:
+                parent[collision_id] = parent[parent[collision_id]]
+                collision_id = parent[collision_id]
+            return collision_id
+
         for node in self.nodes:
-            node.print_statistics()
+            domains = list(node.CD)
+            for collision_id in domains[1:]:
+                parent[find(collision_id)] = find(domains[0])
+
+        components = {}
+        for index, node in enumerate(self.nodes):
+            # A node without collision domain is a component of its own
+            root = find(node.CD[0]) if node.CD else ('node', index)
+            components.setdefault(root, []).append(index)
+        return list(components.values())
+
+    def subnetwork(self, indices):
+        """
+        Returns a new network made of the nodes at the given positions, in the same order.
+        """
+        network = Network(self.sim_params)
+        for index in indices:
+            network.add(self.nodes[index])
+        return network
+
+    def run_components(self, max_workers=None, seed=None, report=True):
+        """
+        Simulates every connected component of the network in its own worker process and merges the results.
+        The workers stop before last_steps_slot, and the last steps run sequentially on the merged network: they decide
+        when the run stops, which is the first step of any component whose events end past slot_limit. With seeded
+        node streams the results are then the ones of Network.run.
+        The nodes of the network are replaced by the simulated ones, so their statistics and histories are available
+        as after Network.run. Falls back to Network.run when the network is a single component.
+        :param max_workers: Number of worker processes, defaults to the number of CPUs.
+        :param seed: Seed of the component streams, each component seeds random and numpy from its own child seed.
+        :param report: Print the statistics of every node at the end of the run.
+        """
+        components = self.connected_components()
+        if len(components) == 1 or max_workers == 1:
+            self.run(report)
+            return
+        if self.profiler is not None or any(getattr(node, 'visualizer', None) is not None for node in self.nodes):
+            raise ValueError("Profiling and live visualization are not supported when running components in parallel.")
+
+        # Workers would otherwise inherit the same random state, every component needs an independent stream
+        seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(len(components))]
+        logger.info(f"Simulating {len(components)} components in parallel.")
+        until = [self.last_steps_slot()] * len(components)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            subnetworks = executor.map(run_component, [self.subnetwork(indices) for indices in components], seeds, until)
+            for indices, subnetwork in zip(components, subnetworks):
+                for position, index in enumerate(indices):
+                    self.nodes[index] = subnetwork.nodes[position]
+                    self.medium_free[index] = subnetwork.medium_free[position]
+                self.events_processed += subnetwork.events_processed
+        self.run(report)
+
+    def last_steps_slot(self):
+        """
+        Returns the slot from which a step can stop the run. A step whose events end past slot_limit stops it, and an
+        event ends at most a DATA frame, SIFS and ACK after its timestamp, so no step before this slot can.
+        """
+        frame_length = ceil(self.sim_params['data_frame_size'] * 8 /
+                            (self.sim_params['bandwidth'] * self.sim_params['slot_duration']))
+        return self.slot_limit - (frame_length + self.sim_params['SIFS_size'] + self.sim_params['ACK_size'])
+
+    def get_statistics(self):
+        """
+        Returns the statistics of every node in the network as a list of dictionaries.
+        """
+        return [node.get_statistics() for node in self.nodes]
+
+    def reschedule(self, index, current_slot):
+        """
+        Polls a node for its next event and updates its entry in the scheduler if it changed.
+        :param index: Index of the node in the network.
+        :param current_slot: The slot at which the node is polled.
+        """
+        event = self.nodes[index].declare_event(current_slot)
+        if event is None:
+            self.scheduler.invalidate(index)
+        elif not self.scheduler.is_scheduled(index, event):
+            self.scheduler.schedule(index, event)
 
     def broadcast(self, event: Event):
         # Broadcasting logic here
-        pass
\ No newline at end of file
+        pass
+
+def run_component(network, seed, until):
+    """
+    Runs one component of a network in a worker process until a slot and returns it with its simulated nodes.
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    network.run(report=False, until=until)
+    return network
@@ -0,0 +1,138 @@
+"""
+profiler.py
+
+Description:
+    The profiler module breaks the wall time of Network.run down into its phases and counts what the network processed.
+    It is optional: Network.run only calls it when a profiler is attached to the network.
+
+Responsibilities:
+    - Accumulates the time spent polling nodes (declare_event), selecting the earliest events, informing the
+      broadcasting nodes (inform_broadcasting) and delivering the events (receive_event).
+    - Counts events per node type, the collisions counted by the APs per collision domain and simulated slots per
+      wall-second.
+    - Optionally samples these counters every interval of simulated slots.
+
+Usage:
+    - network.profiler = NetworkProfiler(interval_slots=10000) before network.run(), then profiler.summary().
+"""
+# profiler.py
+from collections import Counter
+from time import perf_counter
+from src.csma_ca_ap import CsmaCaAp
+
+PHASES = ("poll", "select", "inform", "deliver")
+
+
+class NetworkProfiler:
+    def __init__(self, interval_slots=None):
+        """
+        :param interval_slots: Take a sample of the counters every interval_slots simulated slots, None to disable.
+        """
+        self.phase_time = dict.fromkeys(PHASES, 0.0)
+        self.events_by_type = Counter()
+        self.collisions_by_domain = Counter()
+        self._ap_collisions = {}  # AP ID -> collisions of the AP already counted in collisions_by_domain
+        self.steps = 0
+        self.events = 0
+        self.current_slot = 0
+        self.interval_slots = interval_slots
+        self.time_series = []
+        self._start_time = None
+        self._wall_time = 0.0
+        self._next_sample = interval_slots
+
+    def start(self):
+        """
+        Starts the wall clock of the run.
+        """
+        self._start_time = perf_counter()
+
+    def stop(self):
+        """
+        Stops the wall clock of the run.
+        """
+        self._wall_time += perf_counter() - self._start_time
+        self._start_time = None
+
+    @property
+    def wall_time(self):
+        if self._start_time is None:
+            return self._wall_time
+        return self._wall_time + perf_counter() - self._start_time
+
+    def lap(self, phase, phase_start):
+        """
+        Adds the time elapsed since phase_start to the phase.
+        :return: The start time of the next phase.
+        """
+        now = perf_counter()
+        self.phase_time[phase] += now - phase_start
+        return now
+
+    def record_step(self, events, listeners, current_slot):
+        """
+        Counts the events broadcast in one step of Network.run.
+        :param events: The events broadcast in the step.
+        :param listeners: The nodes that broadcast or heard an event in the step.
+        :param current_slot: The slot reached after the step.
+        """
+        self.steps += 1
+        self.events += len(events)
+        self.current_slot = current_slot
+        for event in events:
+            self.events_by_type[event.data_type.name] += 1
+
+        # Collisions are the ones counted by the APs, k - 1 for k frames reaching an AP together
+        for node in listeners:
+            if isinstance(node, CsmaCaAp):
+                collisions = node.collisions - self._ap_collisions.get(node.ID, 0)
+                if collisions:
+                    self._ap_collisions[node.ID] = node.collisions
+                    for collision_id in node.CD:
+                        self.collisions_by_domain[collision_id] += collisions
+
+        if self._next_sample is not None and current_slot >= self._next_sample:
+            self.time_series.append(self.snapshot())
+            while self._next_sample <= current_slot:
+                self._next_sample += self.interval_slots
+
+    def snapshot(self):
+        """
+        Returns the current value of the counters.
+        """
+        wall_time = self.wall_time
+        return {
+            'slot': self.current_slot,
+            'wall_time_s': wall_time,
+            'steps': self.steps,
+            'events': self.events,
+            'events_by_type': dict(self.events_by_type),
+            'collisions_by_domain': dict(self.collisions_by_domain),
+            'phase_time_s': dict(self.phase_time),
+            'slots_per_wall_s': self.current_slot / wall_time if wall_time > 0 else None,
+        }
+
+    def summary(self):
+        """
+        Returns the counters of the whole run, with the per-interval samples if they were enabled.
+        """
+        summary = self.snapshot()
+        summary['events_per_wall_s'] = self.events / summary['wall_time_s'] if summary['wall_time_s'] > 0 else None
+        if self.interval_slots is not None:
+            summary['time_series'] = self.time_series
+        return summary
+
+    def format_summary(self):
+        """
+        Returns the summary as human readable lines.
+        """
+        summary = self.summary()
+        wall_time = summary['wall_time_s']
+        lines = [f"Wall time: {wall_time:.3f} s, {summary['steps']} steps, {summary['events']} events, "
+                 f"{summary['slots_per_wall_s'] or 0:.0f} slots/s, {summary['events_per_wall_s'] or 0:.0f} events/s"]
+        for phase, phase_time in summary['phase_time_s'].items():
+            share = 100 * phase_time / wall_time if wall_time > 0 else 0
+            lines.append(f"  {phase:<8} {phase_time:8.3f} s ({share:5.1f}%)")
+        lines.append(f"  Events by type: {summary['events_by_type']}")
+        lines.append(f"  Collisions by domain: {summary['collisions_by_domain']}")
+        return lines
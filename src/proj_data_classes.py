@@ -6,7 +6,7 @@ class NodeType(Enum):
     AP = auto()
     COLLISION = auto()
 
-@dataclass
+@dataclass(slots=True)
 class Event:
     data_type: NodeType  # 'tx' for transmitting node, 'ap' for access point, 'idle' if it doesnt matter
     node_id: int # ID of the node
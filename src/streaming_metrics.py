@@ -0,0 +1,302 @@
+"""
+streaming_metrics.py
+
+Description:
+    The streaming_metrics module follows a run as it progresses instead of only reporting its totals at the end.
+    Network.run hands it the nodes that heard an event after every step, and it turns the changes of their counters
+    into windowed metrics with a fixed memory per node, whatever the length of the run:
+        - throughput and collision rate over a sliding window of slots, kept as a ring of bucket counts,
+        - Jain's fairness index of the windowed throughputs of the Tx nodes of every collision domain,
+        - percentiles of the access delay (head of the queue to the end of the ACK) and of the queue wait (arrival to
+          head of the queue), estimated with the P-square algorithm over every snapshot interval.
+    A snapshot of every metric, per node, per collision domain and for the whole network, is taken every
+    snapshot_slots slots and at the end of the run.
+
+Responsibilities:
+    - Estimates quantiles of a stream in constant memory with P-square.
+    - Counts successes and failed transmissions of the Tx nodes and collisions of the APs in sliding windows.
+    - Emits the snapshots to a list, or to a JSON lines file so very long runs keep a constant footprint. The file is
+      truncated when the run starts, and a resumed run keeps appending to it.
+
+Usage:
+    - network.metrics = StreamingMetrics(window_slots=50000, snapshot_slots=100000) before network.run().
+    - network.metrics.snapshots holds the snapshots, unless they were written to the output file.
+"""
+# streaming_metrics.py
+import json
+import os
+from bisect import insort
+import numpy as np
+from src.csma_ca_ap import CsmaCaAp
+from src.csma_ca_tx import CsmaCaTx
+
+
+def jain_fairness(values):
+    """
+    Returns Jain's fairness index (sum x)^2 / (n sum x^2) of the values, None without values or when all are 0.
+    """
+    square_sum = sum(value * value for value in values)
+    if not values or square_sum == 0:
+        return None
+    return sum(values) ** 2 / (len(values) * square_sum)
+
+
+class P2Quantile:
+    """
+    Streaming estimate of a quantile with the P-square algorithm of Jain and Chlamtac: five markers whose heights are
+    adjusted with a piecewise-parabolic formula as samples arrive.
+    """
+    def __init__(self, p):
+        """
+        :param p: The quantile to estimate, in (0, 1).
+        """
+        self.p = p
+        self.count = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value):
+        """
+        Adds a sample to the estimate.
+        """
+        self.count += 1
+        heights = self.heights
+        if self.count <= 5:
+            insort(heights, value)
+            return
+
+        # Cell of the sample, the extreme markers follow the minimum and the maximum
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = next(i for i in range(4) if heights[i] <= value < heights[i + 1])
+
+        positions = self.positions
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Move the middle markers towards their desired positions
+        for i in (1, 2, 3):
+            offset = self.desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                height = heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+                    (positions[i] - positions[i - 1] + step) * (heights[i + 1] - heights[i]) / (positions[i + 1] - positions[i]) +
+                    (positions[i + 1] - positions[i] - step) * (heights[i] - heights[i - 1]) / (positions[i] - positions[i - 1]))
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+
+    def value(self):
+        """
+        Returns the estimated quantile, None before the first sample.
+        """
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            return self.heights[round(self.p * (self.count - 1))]
+        return self.heights[2]
+
+
+class DelaySketch:
+    """
+    P-square estimates of a set of quantiles of the same stream.
+    """
+    def __init__(self, quantiles):
+        self.estimators = [P2Quantile(p) for p in quantiles]
+
+    def add(self, value):
+        for estimator in self.estimators:
+            estimator.add(value)
+
+    def summary(self):
+        return {f"p{estimator.p * 100:g}": estimator.value() for estimator in self.estimators}
+
+
+class StreamingMetrics:
+    def __init__(self, window_slots=50000, buckets=10, snapshot_slots=100000, quantiles=(0.5, 0.9, 0.99), output=None):
+        """
+        :param window_slots: Length of the sliding window of the throughputs and collision rates in slots.
+        :param buckets: Number of buckets the window is kept in, it slides one bucket at a time.
+        :param snapshot_slots: Slots between two snapshots.
+        :param quantiles: Quantiles of the access delay and queue wait reported in every snapshot.
+        :param output: Optional JSON lines file the snapshots are written to instead of being kept in memory.
+        """
+        self.window_slots = window_slots
+        self.buckets = buckets
+        self.bucket_slots = max(1, window_slots // buckets)
+        self.snapshot_slots = snapshot_slots
+        self.quantiles = quantiles
+        self.output = output
+        self.snapshots = []
+        self._next_snapshot = snapshot_slots
+        self._last_snapshot = 0
+        self._node_ids = None
+
+    def _start(self, nodes):
+        """
+        Allocates the counters of the nodes on the first update.
+        """
+        self._node_ids = [node.ID for node in nodes]
+        self._is_tx = [isinstance(node, CsmaCaTx) for node in nodes]
+        self._is_ap = [isinstance(node, CsmaCaAp) for node in nodes]
+        self._domains = {}
+        for index, node in enumerate(nodes):
+            for collision_id in node.CD:
+                self._domains.setdefault(collision_id, []).append(index)
+        tx_node = next((node for node in nodes if isinstance(node, CsmaCaTx)), None)
+        self._packet_size = tx_node.packet_size if tx_node is not None else 0
+        self._slot_duration = nodes[0].params['slot_duration'] if tx_node is None else tx_node.params['slot_duration']
+
+        # Ring of bucket counts per node: successes and failed transmissions of Tx nodes, collisions of APs
+        self._successes = np.zeros((len(nodes), self.buckets), np.int64)
+        self._failures = np.zeros((len(nodes), self.buckets), np.int64)
+        self._bucket = 0
+        self._last_successes = [node.successful_transmissions if tx else 0 for node, tx in zip(nodes, self._is_tx)]
+        self._last_failures = [node.failed_transmissions if tx else node.collisions if ap else 0
+                               for node, tx, ap in zip(nodes, self._is_tx, self._is_ap)]
+        self._reset_sketches()
+
+        # Snapshots of an earlier run to the same file are dropped
+        if self.output is not None:
+            directory = os.path.dirname(self.output)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            open(self.output, 'w').close()
+
+    def _reset_sketches(self):
+        self._access_delay = {index: DelaySketch(self.quantiles) for index, tx in enumerate(self._is_tx) if tx}
+        self._queue_wait = {index: DelaySketch(self.quantiles) for index, tx in enumerate(self._is_tx) if tx}
+        self._domain_access_delay = {collision_id: DelaySketch(self.quantiles) for collision_id in self._domains}
+        self._domain_queue_wait = {collision_id: DelaySketch(self.quantiles) for collision_id in self._domains}
+
+    def _advance(self, bucket):
+        """
+        Slides the window to a bucket, clearing the buckets it enters.
+        """
+        if bucket - self._bucket >= self.buckets:
+            self._successes[:] = 0
+            self._failures[:] = 0
+        else:
+            for stale in range(self._bucket + 1, bucket + 1):
+                self._successes[:, stale % self.buckets] = 0
+                self._failures[:, stale % self.buckets] = 0
+        self._bucket = bucket
+
+    def update(self, current_slot, nodes, updated_nodes):
+        """
+        Counts the outcomes of the last step and takes the snapshots that are due.
+        :param current_slot: The slot reached by Network.run.
+        :param nodes: The nodes of the network.
+        :param updated_nodes: Positions of the nodes that heard an event in the last step, only their counters changed.
+        """
+        if self._node_ids is None:
+            self._start(nodes)
+        while self._next_snapshot <= current_slot:
+            # Steps jump over the boundaries where nothing happens, the snapshot shows the window at the boundary
+            self._advance(self._next_snapshot // self.bucket_slots)
+            self.emit(self.snapshot(self._next_snapshot))
+            self._next_snapshot += self.snapshot_slots
+        if current_slot // self.bucket_slots > self._bucket:
+            self._advance(current_slot // self.bucket_slots)
+
+        column = self._bucket % self.buckets
+        for index in updated_nodes:
+            node = nodes[index]
+            if self._is_tx[index]:
+                successes = node.successful_transmissions - self._last_successes[index]
+                failures = node.failed_transmissions - self._last_failures[index]
+                if successes:
+                    # The packet that succeeded is still described by the node until it is polled again
+                    access_delay = node.package_end - node.access_start
+                    queue_wait = node.access_start - node.packet_arrival
+                    self._access_delay[index].add(access_delay)
+                    self._queue_wait[index].add(queue_wait)
+                    for collision_id in node.CD:
+                        self._domain_access_delay[collision_id].add(access_delay)
+                        self._domain_queue_wait[collision_id].add(queue_wait)
+                    self._successes[index, column] += successes
+                    self._last_successes[index] = node.successful_transmissions
+            elif self._is_ap[index]:
+                failures = node.collisions - self._last_failures[index]
+            else:
+                continue
+            if failures:
+                self._failures[index, column] += failures
+                self._last_failures[index] += failures
+
+    def finish(self, current_slot):
+        """
+        Takes the snapshot of the end of the run, unless one was just taken at that slot.
+        """
+        if self._node_ids is not None and current_slot > self._last_snapshot:
+            self.emit(self.snapshot(current_slot))
+
+    def snapshot(self, slot):
+        """
+        Returns the windowed metrics at a slot, and starts new quantile estimates for the next snapshot interval.
+        """
+        # The window covers the live buckets, the oldest one may still be partially before the start of the run
+        window_start = max(0, (self._bucket - self.buckets + 1) * self.bucket_slots)
+        window_seconds = max(1, slot - window_start) * self._slot_duration
+        successes = self._successes.sum(axis=1)
+        failures = self._failures.sum(axis=1)
+        throughput = successes * self._packet_size / window_seconds / 10**3
+
+        def collision_rate(indices):
+            tx = [index for index in indices if self._is_tx[index]]
+            attempts = int(successes[tx].sum() + failures[tx].sum())
+            return int(failures[tx].sum()) / attempts if attempts else None
+
+        node_metrics = {}
+        for index, node_id in enumerate(self._node_ids):
+            if self._is_tx[index]:
+                node_metrics[node_id] = {'throughput_kbps': float(throughput[index]),
+                                         'collision_rate': collision_rate([index]),
+                                         'access_delay_slots': self._access_delay[index].summary(),
+                                         'queue_wait_slots': self._queue_wait[index].summary()}
+            elif self._is_ap[index]:
+                node_metrics[node_id] = {'collisions': int(failures[index])}
+
+        domain_metrics = {}
+        for collision_id, indices in self._domains.items():
+            tx = [index for index in indices if self._is_tx[index]]
+            domain_metrics[str(collision_id)] = {
+                'throughput_kbps': float(throughput[tx].sum()),
+                'collision_rate': collision_rate(indices),
+                'ap_collisions': int(sum(failures[index] for index in indices if self._is_ap[index])),
+                'jain_fairness': jain_fairness([float(throughput[index]) for index in tx]),
+                'access_delay_slots': self._domain_access_delay[collision_id].summary(),
+                'queue_wait_slots': self._domain_queue_wait[collision_id].summary(),
+            }
+
+        tx = [index for index, is_tx in enumerate(self._is_tx) if is_tx]
+        network_metrics = {'throughput_kbps': float(throughput[tx].sum()),
+                           'collision_rate': collision_rate(range(len(self._node_ids))),
+                           'jain_fairness': jain_fairness([float(throughput[index]) for index in tx])}
+
+        self._reset_sketches()
+        self._last_snapshot = slot
+        return {'slot': slot, 'window_slots': slot - window_start, 'network': network_metrics,
+                'domains': domain_metrics, 'nodes': node_metrics}
+
+    def emit(self, snapshot):
+        """
+        Keeps a snapshot, or appends it to the output file.
+        """
+        if self.output is None:
+            self.snapshots.append(snapshot)
+            return
+        # Opened per snapshot, so the collector holds no file handle and a checkpointed network stays picklable
+        with open(self.output, 'a') as file:
+            file.write(json.dumps(snapshot) + '\n')
@@ -0,0 +1,154 @@
+"""
+vectorized_network.py
+
+Description:
+    The vectorized_network module simulates a single collision domain with one AP and many Tx stations,
+    keeping the state of every station in NumPy arrays instead of one CsmaCaTx object per station.
+    Each contention round (DATA, SIFS, ACK or COLLISION) is resolved with vectorized min/argmin operations.
+
+Responsibilities:
+    - Follows the CsmaCaTx/CsmaCaAp semantics of Network.run: DIFS, backoff freezing, SIFS, ACK, CW0/CWmax doubling.
+    - Reports the same per-node statistics as Network.get_statistics.
+
+Usage:
+    - Saturated single-domain scenarios with hundreds of stations, where Network.run spends its time in Python loops.
+    - Node histories are not recorded.
+"""
+# vectorized_network.py
+from math import ceil
+import numpy as np
+from utility.logger_config import logger
+from utility.poisson_traffic import as_traffic_source
+
+NO_EVENT = np.iinfo(np.int64).max
+
+
+class VectorizedNetwork:
+    def __init__(self, sim_params, tx_arrivals, tx_ids=None, ap_id="AP_Node_1", rng=None):
+        """
+        :param sim_params: The simulation parameters.
+        :param tx_arrivals: One arrival list or TrafficSource per Tx station.
+        :param tx_ids: IDs of the Tx stations, defaults to Tx_Node_1..N.
+        :param ap_id: ID of the AP.
+        :param rng: numpy.random.Generator used for the backoff draws.
+        """
+        logger.debug("VectorizedNetwork instance created.")
+        self.params = sim_params
+        self.slot_limit = int(sim_params['simulation_time']/(sim_params['slot_duration']))
+        self.DIFS = sim_params['DIFS_size']
+        self.SIFS = sim_params['SIFS_size']
+        self.ACK = sim_params['ACK_size']
+        self.CW_MIN = sim_params['CW0']
+        self.CW_MAX = sim_params['CWmax']
+        self.packet_size = sim_params['data_frame_size'] * 8
+        self.PACKAGE_LENGTH = ceil(self.packet_size / (sim_params['bandwidth'] * sim_params['slot_duration']))
+
+        count = len(tx_arrivals)
+        self.tx_ids = tx_ids if tx_ids is not None else [f"Tx_Node_{i + 1}" for i in range(count)]
+        self.ap_id = ap_id
+        self.arrivals = [as_traffic_source(arrivals) for arrivals in tx_arrivals]
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        # State of every station, one entry per station
+        self.event_slot = np.full(count, NO_EVENT, dtype=np.int64)  # Slot of the pending DATA, NO_EVENT if idle
+        self.backoff = np.zeros(count, dtype=np.int64)
+        self.backoff_start = np.zeros(count, dtype=np.int64)
+        self.collision_cnt = np.zeros(count, dtype=np.int64)
+        self.successful_transmissions = np.zeros(count, dtype=np.int64)
+
+        self.collisions = 0  # Collisions seen by the AP
+        self.events_processed = 0
+
+    def draw_backoffs(self, stations):
+        """
+        Randomly selects the backoff of the stations based on their collision count.
+        :param stations: Indexes of the stations, in increasing order.
+        """
+        window = np.minimum(self.CW_MAX, 2 ** self.collision_cnt[stations] * self.CW_MIN)
+        return self.rng.integers(0, window + 1)
+
+    def declare_packet(self, station, medium_free):
+        """
+        Starts the contention of the next packet of an idle station, see CsmaCaTx.declare_event.
+        """
+        if not self.arrivals[station]:
+            self.event_slot[station] = NO_EVENT
+            return
+        start = max(self.arrivals[station].pop(), medium_free)
+        self.backoff[station] = self.draw_backoffs([station])[0]
+        self.backoff_start[station] = start + self.DIFS
+        self.event_slot[station] = start + self.DIFS + self.backoff[station]
+
+    def run(self, report=True):
+        """
+        Runs the simulation until the slot limit or until no station has packets left.
+        :param report: Print the statistics of every node at the end of the run.
+        """
+        event_slot = self.event_slot
+        backoff = self.backoff
+        backoff_start = self.backoff_start
+        nav_length = self.PACKAGE_LENGTH + self.SIFS + self.ACK
+
+        for station in range(len(self.arrivals)):
+            self.declare_packet(station, 0)
+
+        current_slot = 0
+        while current_slot < self.slot_limit:
+            earliest_slot = event_slot.min()
+            if earliest_slot == NO_EVENT:
+                logger.info("No events to process. Ending simulation.")
+                break
+
+            # DATA: every station picking the earliest slot transmits, the AP sees a collision if there are several
+            winners = np.flatnonzero(event_slot == earliest_slot)
+            nav = int(earliest_slot) + nav_length
+            self.events_processed += len(winners)
+            self.collisions += len(winners) - 1
+            current_slot = nav
+            if current_slot >= self.slot_limit:
+                break
+
+            # Stations that wanted to transmit before the medium is free again freeze their backoff
+            deferred = event_slot <= nav
+            deferred[winners] = False
+            frozen = backoff_start[deferred] - earliest_slot < backoff[deferred]
+            backoff[deferred] = np.where(frozen, backoff_start[deferred] + backoff[deferred] - earliest_slot, backoff[deferred])
+            backoff_start[deferred] = nav + self.DIFS
+            event_slot[deferred] = nav + self.DIFS + backoff[deferred]
+
+            # ACK or COLLISION from the AP, one response per received frame
+            self.events_processed += len(winners)
+            if len(winners) == 1:
+                station = winners[0]
+                self.successful_transmissions[station] += 1
+                self.collision_cnt[station] = 0
+                self.declare_packet(station, nav)
+            else:
+                self.collision_cnt[winners] += 1
+                backoff[winners] = self.draw_backoffs(winners)
+                backoff_start[winners] = nav + self.DIFS
+                event_slot[winners] = nav + self.DIFS + backoff[winners]
+
+        if report:
+            for statistics in self.get_statistics():
+                if statistics['type'] == 'TX':
+                    print(f"TX: {statistics['node']}: Successful Transmission: {statistics['successful_transmissions']}")
+                    print(f"TX: {statistics['node']}: Throughput: {statistics['throughput_kbps']:.2f} Kbps")
+                else:
+                    print(f"AP: {statistics['node']} Collisions: {statistics['collisions']}")
+
+    def get_statistics(self):
+        """
+        Returns the statistics of every node in the network as a list of dictionaries, in the format of Network.get_statistics.
+        """
+        statistics = []
+        for station, tx_id in enumerate(self.tx_ids):
+            successes = int(self.successful_transmissions[station])
+            statistics.append({
+                'node': tx_id,
+                'type': 'TX',
+                'successful_transmissions': successes,
+                'throughput_kbps': successes * self.packet_size / self.params['simulation_time'] / 10**3,
+            })
+        statistics.append({'node': self.ap_id, 'type': 'AP', 'collisions': self.collisions})
+        return statistics
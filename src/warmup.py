@@ -0,0 +1,110 @@
+"""
+warmup.py
+
+Description:
+    The warmup module detects the start-up transient of a run and removes it from the node statistics.
+    Every Tx node starts with a packet at slot 0, so the first slots are more congested than the steady state.
+    The network throughput is recorded per window of slots and the truncation point is chosen with MSER-5:
+    the point minimising the variance of the mean of the remaining windows.
+
+Responsibilities:
+    - Records the success and collision counters of every node at the end of every window.
+    - Picks the truncation point with MSER and rebases the counters of the nodes on it.
+
+Usage:
+    - network.warmup = WarmupDetector(window_slots=5000) before network.run(). At the end of the run the statistics of
+      the nodes only cover the slots after the truncation point.
+"""
+# warmup.py
+from src.csma_ca_ap import CsmaCaAp
+from src.csma_ca_tx import CsmaCaTx
+
+
+def mser_truncation(samples, batch_size=5):
+    """
+    Returns the number of leading samples to drop with MSER-b.
+    The samples are averaged in batches of batch_size and the truncation d minimising
+    sum((x_i - mean_d)^2, i > d) / (n - d)^2 is searched over the first half of the batches.
+    The mean and the sum of squares of the remaining batches are updated from the last batch backwards (Welford), so
+    every truncation is evaluated in a single O(n) pass.
+    """
+    batches = [sum(samples[i:i + batch_size]) / batch_size
+               for i in range(0, len(samples) - batch_size + 1, batch_size)]
+    count = len(batches)
+    if count < 2:
+        return 0
+
+    statistics = [0.0] * (count // 2 + 1)
+    mean = squares = 0.0
+    for truncation in range(count - 1, -1, -1):
+        remaining = count - truncation
+        delta = batches[truncation] - mean
+        mean += delta / remaining
+        squares += delta * (batches[truncation] - mean)
+        if truncation < len(statistics):
+            statistics[truncation] = squares / remaining ** 2
+
+    # The earliest truncation wins ties
+    return min(range(len(statistics)), key=statistics.__getitem__) * batch_size
+
+
+class WarmupDetector:
+    def __init__(self, window_slots=5000, batch_size=5):
+        """
+        :param window_slots: Length of a throughput window in slots.
+        :param batch_size: Number of windows per MSER batch, 5 for MSER-5.
+        """
+        self.window_slots = window_slots
+        self.batch_size = batch_size
+        self.snapshots = []  # Counters of every node at the end of each window
+        self.truncation_slot = None
+        self._next_boundary = window_slots
+
+    def update(self, current_slot, nodes):
+        """
+        Records the counters of the nodes for the windows that ended before the current slot.
+        :param current_slot: The slot reached by Network.run.
+        :param nodes: The nodes of the network.
+        """
+        if current_slot < self._next_boundary:
+            return
+        snapshot = [node.successful_transmissions if isinstance(node, CsmaCaTx) else node.collisions for node in nodes]
+        # Nothing happens between the boundaries a single step jumps over
+        while self._next_boundary <= current_slot:
+            self.snapshots.append(snapshot)
+            self._next_boundary += self.window_slots
+
+    def window_throughput(self, nodes):
+        """
+        Returns the number of successful transmissions of the network in every complete window.
+        """
+        tx_positions = [index for index, node in enumerate(nodes) if isinstance(node, CsmaCaTx)]
+        totals = [sum(snapshot[index] for index in tx_positions) for snapshot in self.snapshots]
+        return [total - previous for total, previous in zip(totals, [0] + totals[:-1])]
+
+    def truncate(self, nodes):
+        """
+        Picks the truncation point and rebases the counters and the measured time of the nodes on it.
+        :param nodes: The nodes of the network, in the order they were recorded.
+        :return: The truncation slot.
+        """
+        windows = mser_truncation(self.window_throughput(nodes), self.batch_size)
+        self.truncation_slot = windows * self.window_slots
+        if windows == 0:
+            return 0
+
+        snapshot = self.snapshots[windows - 1]
+        for node, count in zip(nodes, snapshot):
+            if isinstance(node, CsmaCaTx):
+                node.successful_transmissions -= count
+                node.measured_time -= self.truncation_slot * node.params['slot_duration']
+            elif isinstance(node, CsmaCaAp):
+                node.collisions -= count
+        return self.truncation_slot
+
+    def summary(self):
+        """
+        Returns the truncation point and the number of recorded windows.
+        """
+        return {'window_slots': self.window_slots, 'windows': len(self.snapshots),
+                'truncation_slot': self.truncation_slot}
@@ -10,20 +10,30 @@ Responsibilities:
 
 Usage:
     - The logger instance is imported by other modules.
+    - The command line entry points call setup_logger() once the arguments are parsed.
 """
 import logging
 import os
 
+# Named simulator logger, so libraries logging to the root logger (e.g. matplotlib) stay out of the simulation log
+logger = logging.getLogger('csma_ca')
+
 def setup_logger(debug=False, log_file='sim/output/simulation_log.txt'):
+    """
+    Attaches the file and console handlers to the simulator logger. Called once by the command line entry points;
+    until then only warnings and errors are reported and debug messages cost a single level check.
+    """
     log_level = logging.DEBUG if debug else logging.INFO
 
     log_dir = os.path.dirname(log_file)
-    if not os.path.exists(log_dir):
+    if log_dir and not os.path.exists(log_dir):
         os.makedirs(log_dir)
     
-    # Create logger
-    logger = logging.getLogger()
+    # Configure the simulator logger, replacing the handlers of a previous setup
     logger.setLevel(log_level)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
 
     # Create file handler which logs even debug messages
     file_handler = logging.FileHandler(log_file, mode='w')
@@ -43,5 +53,3 @@ def setup_logger(debug=False, log_file='sim/output/simulation_log.txt'):
     logger.addHandler(console_handler)
 
     return logger
-
-logger = setup_logger(debug=True)
@@ -1,15 +1,21 @@
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from src.event_history import EVENT_NAMES
+
+EVENT_COLORS = {
+    'ACK': 'green',
+    'DATA': 'blue',
+    'DIFS': 'gray',
+    'SIFS': 'gray',
+    'COLLISION': 'red'
+}
 
 class EventVisualizer:
     def __init__(self):
-        self.colors = {
-            'ACK': 'green',
-            'DATA': 'blue',
-            'DIFS': 'gray',
-            'SIFS': 'gray',
-            'COLLISION': 'red'
-        }
+        self.colors = EVENT_COLORS
         self.fig, self.ax = plt.subplots()
         self.max_x = 0  # Initialize max_x to keep track of the maximum x value
 
@@ -35,3 +41,40 @@ class EventVisualizer:
 
     def show(self):
         plt.show()
+
+def render_timeline(nodes, file_name, window=None, dpi=150):
+    """
+    Renders the recorded histories of the nodes into an image after the run.
+    Draws one broken_barh collection per node and event type on the Agg backend, no window is opened.
+    :param nodes: The nodes of the network, their history must have been recorded.
+    :param file_name: Path of the image to write, e.g. timeline.png.
+    :param window: Optional (start, end) slot range to draw.
+    """
+    fig = Figure(figsize=(12, 1 + 0.5 * len(nodes)))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    max_x = 0
+    for y_position, node in enumerate(nodes):
+        history = node.history.to_array()
+        if window is not None:
+            start, end = window
+            history = history[(history['timestamp'] < end) & (history['timestamp'] + history['duration'] > start)]
+        if len(history):
+            max_x = max(max_x, int(np.max(history['timestamp'] + history['duration'])))
+        for code, event_name in enumerate(EVENT_NAMES):
+            events = history[history['event'] == code]
+            if len(events):
+                bars = np.column_stack((events['timestamp'], events['duration']))
+                ax.broken_barh(bars, (y_position, 1), facecolors=EVENT_COLORS.get(event_name, "black"),
+                               edgecolor='black', linewidth=0.3)
+
+    node_ids = [str(node.ID) for node in nodes]
+    ax.set_yticks([y_position + 0.5 for y_position in range(len(node_ids))])
+    ax.set_yticklabels(node_ids)
+    ax.set_ylim(0, len(node_ids))
+    ax.set_xlim(window if window is not None else (0, max_x))
+    ax.set_xlabel('Time (slots)')
+    legend_handles = [patches.Patch(color=color, label=event) for event, color in EVENT_COLORS.items()]
+    ax.legend(handles=legend_handles, loc='upper right')
+    fig.savefig(file_name, dpi=dpi, bbox_inches='tight')
@@ -1,28 +1,139 @@
 import numpy as np
+from utility.traffic_models import poisson_arrivals
 
-def generate_poisson_traffic(lam, simulation_time, slot_duration):
+def interpacket_slots(lam, slot_duration, size, rng=None):
     """
-    Generates Poisson-distributed traffic.
+    Draws Poisson inter-arrival times in terms of slots.
 
     Parameters:
     lam (float): The rate of arrivals (lambda).
-    simulation_time (float): The total simulation time in seconds.
-    frame_size (float): The size of a frame in seconds.
+    slot_duration (float): The size of a slot in seconds.
+    size (int): The number of inter-arrival times to draw.
+    rng (numpy.random.Generator): Random generator to draw from. Defaults to the global numpy random state.
 
     Returns:
-    list: A list of arrival times in terms of frame numbers.
+    numpy.ndarray: Inter-arrival times in slots.
     """
+    rng = np.random if rng is None else rng
     # Generate uniform distribution
-    uniform_distribution = np.random.uniform(low=0, high=1, size=int(lam * (simulation_time * 2)))
+    uniform_distribution = rng.uniform(low=0, high=1, size=size)
     # Convert uniform distribution to exponential distribution
     exponential_distribution = -(1 / lam) * np.log(1 - uniform_distribution)
     # Transform the packet transmittion time to interpacket slot times
-    interpacket_time_slot = np.ceil(exponential_distribution / (slot_duration)).astype(int)
-    # Find the approximated packet slot arrival time
-    arrival_time_slot = np.cumsum(interpacket_time_slot)
+    return np.ceil(exponential_distribution / (slot_duration)).astype(int)
 
+def generate_poisson_traffic(lam, simulation_time, slot_duration):
+    """
+    Generates Poisson-distributed traffic.
+
+    Parameters:
+    lam (float): The rate of arrivals (lambda).
+    simulation_time (float): The total simulation time in seconds.
+    frame_size (float): The size of a frame in seconds.
+
+    Returns:
+    numpy.ndarray: The arrival times in terms of slots, before the end of the simulation.
+    """
+    # Single station of the batched generator, truncated exactly at the horizon
+    _, arrival_time_slot = poisson_arrivals([lam], int(simulation_time / slot_duration), slot_duration)
     return arrival_time_slot
 
+class TrafficSource:
+    """
+    Cursor over the packet arrival slots of a station.
+    Arrivals are buffered one chunk at a time, so reading the next arrival is O(1).
+    """
+    def __init__(self, arrivals=()):
+        self._buffer = [int(arrival) for arrival in arrivals]
+        self._cursor = 0
+
+    def _refill(self):
+        """
+        Loads the next chunk of arrivals into the buffer.
+        :return: False if the source is exhausted.
+        """
+        return False
+
+    def __bool__(self):
+        return self._cursor < len(self._buffer) or self._refill()
+
+    def peek(self):
+        """
+        Returns the next arrival slot without consuming it, None if the source is exhausted.
+        """
+        if not self:
+            return None
+        return self._buffer[self._cursor]
+
+    def pop(self):
+        """
+        Consumes and returns the next arrival slot.
+        """
+        if not self:
+            raise IndexError("pop from an exhausted traffic source")
+        arrival = self._buffer[self._cursor]
+        self._cursor += 1
+        return arrival
+
+class PoissonTrafficSource(TrafficSource):
+    """
+    Endless Poisson arrival stream generated lazily in NumPy chunks.
+    """
+    def __init__(self, lam, slot_duration, initial_arrivals=(), chunk_size=4096, rng=None):
+        """
+        :param lam: The rate of arrivals (lambda).
+        :param slot_duration: The size of a slot in seconds.
+        :param initial_arrivals: Arrival slots emitted before the generated ones, e.g. [0] for a packet at start-up.
+        :param chunk_size: Number of arrivals generated per chunk.
+        :param rng: numpy.random.Generator to draw from. Defaults to the global numpy random state.
+        """
+        super().__init__(initial_arrivals)
+        self.lam = lam
+        self.slot_duration = slot_duration
+        self.chunk_size = chunk_size
+        self.rng = rng
+        self._last_arrival = 0
+
+    def _refill(self):
+        interpacket_time_slot = interpacket_slots(self.lam, self.slot_duration, self.chunk_size, self.rng)
+        arrival_time_slot = np.cumsum(interpacket_time_slot) + self._last_arrival
+        self._last_arrival = int(arrival_time_slot[-1])
+        self._buffer = arrival_time_slot.tolist()
+        self._cursor = 0
+        return True
+
+class ArrayTrafficSource(TrafficSource):
+    """
+    Arrival stream read from a NumPy array, e.g. the slice of a station in the CSR output of utility/traffic_models.py.
+    Only the current chunk is converted to Python integers, the array itself can be shared by every station.
+    """
+    def __init__(self, arrivals, initial_arrivals=(), chunk_size=4096):
+        """
+        :param arrivals: Increasing NumPy array of arrival slots.
+        :param initial_arrivals: Arrival slots emitted before the array, e.g. [0] for a packet at start-up.
+        :param chunk_size: Number of arrivals converted per chunk.
+        """
+        super().__init__(initial_arrivals)
+        self.arrivals = arrivals
+        self.chunk_size = chunk_size
+        self._next = 0
+
+    def _refill(self):
+        if self._next >= len(self.arrivals):
+            return False
+        self._buffer = self.arrivals[self._next:self._next + self.chunk_size].tolist()
+        self._next += self.chunk_size
+        self._cursor = 0
+        return True
+
+def as_traffic_source(arrivals):
+    """
+    Wraps an explicit list of arrival slots into a TrafficSource, sources are returned unchanged.
+    """
+    if isinstance(arrivals, TrafficSource):
+        return arrivals
+    return TrafficSource(arrivals)
+
 def main():
     # Example usage:
     lam = 2000  # Rate of arrivals (e.g., 100 frames per second)
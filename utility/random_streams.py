@@ -0,0 +1,70 @@
+"""
+random_streams.py
+
+Description:
+    The random_streams module gives every node of a seeded run its own NumPy random streams.
+    The streams of a node are spawned from the root seed with a key derived from the node ID, so they do not depend on
+    the order the nodes are created in, the other nodes of the topology, or the process the node is simulated in.
+    A node has one SeedSequence with two children: its backoff stream and its traffic stream. Keeping them apart lets
+    two runs of the same seed, e.g. with a CW0 of 8 and of 16, share the same arrivals (common random numbers) even
+    though they draw a different number of backoffs.
+
+Responsibilities:
+    - Derives the SeedSequence of a node from the root seed and the node ID.
+    - Draws the backoffs of a node from pre-drawn batches of uniform numbers, one Generator call per batch.
+
+Usage:
+    - backoff_rng, traffic_rng = node_streams(seed, "Tx_Node_1")
+    - backoff_rng.randint(0, window) draws a backoff, traffic_rng feeds a PoissonTrafficSource.
+"""
+# random_streams.py
+import zlib
+import numpy as np
+
+
+def node_seed_sequence(seed, node_id):
+    """
+    Returns the SeedSequence of a node, spawned from the root seed with the CRC-32 of the node ID as key.
+    """
+    return np.random.SeedSequence(seed, spawn_key=(zlib.crc32(str(node_id).encode()),))
+
+
+def node_streams(seed, node_id, batch_size=1024):
+    """
+    Returns the backoff stream and the traffic numpy.random.Generator of a node.
+    """
+    backoff, traffic = node_seed_sequence(seed, node_id).spawn(2)
+    return BackoffStream(np.random.default_rng(backoff), batch_size), np.random.default_rng(traffic)
+
+
+class BackoffStream:
+    """
+    Uniform integer draws served from batches of a numpy.random.Generator.
+    Has the randint(low, high) method of random.Random, so CsmaCaTx uses either one.
+    """
+    def __init__(self, rng, batch_size=1024):
+        """
+        :param rng: numpy.random.Generator the batches are drawn from.
+        :param batch_size: Number of uniform numbers drawn per batch.
+        """
+        self.rng = rng
+        self.batch_size = batch_size
+        self._buffer = []
+        self._cursor = 0
+
+    def random(self):
+        """
+        Returns the next uniform number in [0, 1).
+        """
+        if self._cursor == len(self._buffer):
+            self._buffer = self.rng.random(self.batch_size).tolist()
+            self._cursor = 0
+        value = self._buffer[self._cursor]
+        self._cursor += 1
+        return value
+
+    def randint(self, low, high):
+        """
+        Returns a uniform integer in [low, high], both included.
+        """
+        return low + int(self.random() * (high - low + 1))
@@ -0,0 +1,129 @@
+"""
+result_cache.py
+
+Description:
+    The result_cache module keeps the results of simulation runs on disk, keyed by a hash of everything they depend on:
+    the merged simulation parameters, the test topology, the seed, the run options and the source code.
+    A run whose key is already cached does not need to be simulated again.
+
+Responsibilities:
+    - Computes the content key of a run, including a hash of the simulator sources.
+    - Stores JSON results with optional NumPy arrays (e.g. node histories) in one compressed .npz file per key.
+    - Evicts the least recently used entries once the cache grows over its size cap.
+
+Usage:
+    - cache = ResultCache(); key = cache_key(sim_params, test_params, seed)
+    - cache.get(key) returns (result, arrays) or None, cache.put(key, result, arrays) stores a run.
+"""
+# result_cache.py
+import hashlib
+import json
+import os
+import numpy as np
+from utility.logger_config import logger
+
+# Directories whose Python sources decide the results of a run
+SOURCE_DIRECTORIES = ('src', 'utility', 'sim')
+
+_code_version = None
+
+
+def code_version():
+    """
+    Returns a hash of the simulator sources, computed once per process.
+    """
+    global _code_version
+    if _code_version is None:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        digest = hashlib.sha256()
+        for directory in SOURCE_DIRECTORIES:
+            path = os.path.join(root, directory)
+            for file_name in sorted(os.listdir(path)):
+                if file_name.endswith('.py'):
+                    digest.update(file_name.encode())
+                    with open(os.path.join(path, file_name), 'rb') as file:
+                        digest.update(file.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def cache_key(sim_params, test_params, seed, options=None):
+    """
+    Returns the content key of a run.
+    :param sim_params: The merged simulation parameters.
+    :param test_params: The test parameters, including its topology.
+    :param seed: The seed of the run, runs without seed are not reproducible and must not be cached.
+    :param options: Any other setting that changes the results, e.g. the engine or the stopping rule.
+    """
+    content = json.dumps({'sim_params': sim_params, 'test_params': test_params, 'seed': seed,
+                          'options': options or {}, 'code': code_version()}, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory='sim/output/cache', max_bytes=512 * 2**20):
+        """
+        :param directory: Directory holding one .npz file per cached run.
+        :param max_bytes: Size cap of the directory, the least recently used entries are evicted beyond it.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def get(self, key):
+        """
+        Returns the cached result and arrays of a key, None on a miss.
+        A hit refreshes the modification time of the entry, which orders the LRU eviction.
+        """
+        path = self.path(key)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                result = json.loads(str(entry['result']))
+                arrays = {name: entry[name] for name in entry.files if name != 'result'}
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # Evicted by another process since it was read
+        logger.debug(f"Result cache hit {key}")
+        return result, arrays
+
+    def put(self, key, result, arrays=None):
+        """
+        Stores the result of a run and evicts old entries if the cache is over its cap.
+        :param result: JSON serializable result, e.g. the node statistics.
+        :param arrays: Optional dictionary of name -> NumPy array, e.g. the node histories.
+        """
+        # Written under a temporary name so a concurrent reader never sees a partial entry
+        temporary = os.path.join(self.directory, f"{key}.{os.getpid()}.tmp.npz")
+        np.savez_compressed(temporary, result=np.array(json.dumps(result)), **(arrays or {}))
+        os.replace(temporary, self.path(key))
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in max_bytes.
+        """
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith('.npz') and '.tmp.' not in file_name:
+                try:
+                    stat = os.stat(os.path.join(self.directory, file_name))
+                except FileNotFoundError:
+                    continue  # Evicted by another process sharing the cache
+                entries.append((stat.st_mtime, stat.st_size, file_name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, file_name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            logger.debug(f"Result cache evicted {file_name}")
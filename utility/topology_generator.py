@@ -0,0 +1,231 @@
+"""
+topology_generator.py
+
+Description:
+    The topology_generator module builds multi-AP, multi-cell test topologies from node positions in a 2-D area.
+    Two nodes hear each other when they are within the carrier-sense range. The Network only knows collision domains,
+    so the hearing graph is covered with cliques: nodes hear each other exactly when they share a domain.
+
+    The pairs within range are found by bucketing the nodes into a grid of square cells whose diagonal is the sense
+    range: all the nodes of a cell hear each other, and only the cells at most two cells away are searched, never all
+    the pairs. The pairs are then covered greedily with compact groups of nodes that all hear each other, so the number
+    of collision domains grows with the number of nodes, not with the number of pairs.
+
+    Stations are placed uniformly in a disc around a randomly chosen AP, so every station hears at least one AP.
+    Two stations that do not hear each other but hear a common AP are hidden terminals.
+
+Responsibilities:
+    - Places the APs on a lattice or at random, and the stations around them.
+    - Finds the pairs of nodes within range with a spatial grid and covers them with collision domains.
+    - Counts the hidden-terminal pairs and writes a test file that sim_tb.py loads like the hand-written ones.
+
+Usage:
+    - test_params = generate_topology(aps=16, stations=1000, area=(500, 500), sense_range=60, seed=1)
+    - python utility/topology_generator.py grid_1000 --aps 16 --stations 1000 --area 500 500 --range 60 --seed 1
+"""
+# topology_generator.py
+import argparse
+import json
+import os
+from math import ceil, sqrt
+import numpy as np
+
+
+def place_nodes(aps, stations, area, association_range, ap_layout='grid', rng=None):
+    """
+    Returns the positions of the APs and of the stations as (N, 2) arrays.
+    :param association_range: Stations are placed within this distance of their AP, inside the area.
+    :param ap_layout: "grid" spreads the APs on a regular lattice, "random" places them uniformly.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    width, height = area
+    if ap_layout == 'grid':
+        columns = ceil(sqrt(aps * width / height))
+        rows = ceil(aps / columns)
+        cells = [((column + 0.5) * width / columns, (row + 0.5) * height / rows)
+                 for row in range(rows) for column in range(columns)]
+        ap_positions = np.array(cells[:aps], dtype=float).reshape(aps, 2)
+    elif ap_layout == 'random':
+        ap_positions = rng.uniform((0, 0), (width, height), size=(aps, 2))
+    else:
+        raise ValueError(f"Invalid AP layout {ap_layout}. Layout must be grid or random.")
+
+    # Uniform in the disc around the AP, points falling outside the area are drawn again
+    station_positions = np.empty((stations, 2))
+    pending = np.arange(stations)
+    homes = rng.integers(0, aps, size=stations)
+    while pending.size:
+        radius = association_range * np.sqrt(rng.random(pending.size))
+        angle = rng.uniform(0, 2 * np.pi, pending.size)
+        points = ap_positions[homes[pending]] + np.column_stack((radius * np.cos(angle), radius * np.sin(angle)))
+        inside = (points[:, 0] >= 0) & (points[:, 0] <= width) & (points[:, 1] >= 0) & (points[:, 1] <= height)
+        station_positions[pending[inside]] = points[inside]
+        pending = pending[~inside]
+    return ap_positions, station_positions
+
+
+def grid_cells(positions, cell_size):
+    """
+    Buckets the nodes into square cells.
+    :return: Dictionary of (column, row) -> array of the positions of its nodes.
+    """
+    cells = {}
+    for index, cell in enumerate(map(tuple, np.floor(positions / cell_size).astype(np.int64))):
+        cells.setdefault(cell, []).append(index)
+    return {cell: np.array(indices) for cell, indices in cells.items()}
+
+
+def neighbour_pairs(positions, sense_range):
+    """
+    Returns the cells of the nodes and the pairs (i, j), i < j, of nodes within range of each other that are in
+    different cells. The cells have a diagonal of sense_range, so nodes of the same cell are always within range and
+    a node within range is at most two cells away.
+    """
+    cell_size = sense_range / sqrt(2)
+    cells = grid_cells(positions, cell_size)
+    reach = ceil(sense_range / cell_size)
+    offsets = [(dx, dy) for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1) if (dx, dy) > (0, 0)]
+
+    pairs = []
+    for (column, row), members in cells.items():
+        for dx, dy in offsets:
+            others = cells.get((column + dx, row + dy))
+            if others is None:
+                continue
+            distances = np.linalg.norm(positions[members][:, None, :] - positions[others][None, :, :], axis=2)
+            first, second = np.nonzero(distances <= sense_range)
+            pairs.extend(zip(members[first].tolist(), others[second].tolist()))
+    return cells, [(min(i, j), max(i, j)) for i, j in pairs]
+
+
+def collision_domains(positions, sense_range):
+    """
+    Covers the hearing graph of the nodes with collision domains: groups of nodes that all hear each other, such that
+    two nodes share a domain exactly when they are within range.
+    Every pair within range that no domain covers yet grows a new domain greedily from the nodes hearing both: first
+    the ones that hear a member over a pair not covered yet, then the nearest to the middle of the pair. The domains
+    are compact groups of nodes, so their number grows with the number of nodes and not with the number of pairs.
+    :return: (domains of every node, list of the neighbour sets of every node).
+    """
+    cells, pairs = neighbour_pairs(positions, sense_range)
+    neighbours = [set() for _ in range(len(positions))]
+    for members in cells.values():
+        members = members.tolist()
+        for index in members:
+            neighbours[index].update(members)
+            neighbours[index].discard(index)
+    for i, j in pairs:
+        neighbours[i].add(j)
+        neighbours[j].add(i)
+
+    points = positions.tolist()
+    uncovered = [set(node_neighbours) for node_neighbours in neighbours]
+    domains = [[] for _ in range(len(positions))]
+    domain_count = 0
+    for first in range(len(positions)):
+        while uncovered[first]:
+            second = min(uncovered[first])
+            middle_x = (points[first][0] + points[second][0]) / 2
+            middle_y = (points[first][1] + points[second][1]) / 2
+            hearing = neighbours[first] & neighbours[second]
+            candidates = sorted(hearing, key=lambda index: (index not in uncovered[first], index not in uncovered[second],
+                                                            (points[index][0] - middle_x) ** 2 +
+                                                            (points[index][1] - middle_y) ** 2))
+            members = [first, second]
+            for candidate in candidates:
+                # hearing holds the nodes that hear every member so far
+                if candidate in hearing:
+                    members.append(candidate)
+                    hearing &= neighbours[candidate]
+            for member in members:
+                uncovered[member].difference_update(members)
+                domains[member].append(f"cd_{domain_count}")
+            domain_count += 1
+
+    # A node that hears nobody is a domain of its own
+    for index, node_domains in enumerate(domains):
+        if not node_domains:
+            node_domains.append(f"cd_{domain_count}")
+            domain_count += 1
+    return domains, neighbours
+
+
+def hidden_terminals(neighbours, ap_indices):
+    """
+    Returns the number of pairs of stations that hear a common AP but not each other.
+    """
+    hidden = set()
+    ap_set = set(ap_indices)
+    for ap in ap_indices:
+        stations = sorted(index for index in neighbours[ap] if index not in ap_set)
+        for position, first in enumerate(stations):
+            for second in stations[position + 1:]:
+                if second not in neighbours[first]:
+                    hidden.add((first, second))
+    return len(hidden)
+
+
+def generate_topology(aps, stations, area, sense_range, association_range=None, ap_layout='grid', seed=None,
+                      sim_overwrite=None):
+    """
+    Generates a test topology in the format of sim/tst.
+    :param aps: Number of APs.
+    :param stations: Number of Tx stations.
+    :param area: (width, height) of the area, in the unit of the ranges.
+    :param sense_range: Carrier-sense range, nodes closer than it hear each other.
+    :param association_range: Maximum distance of a station to its AP, defaults to the sense range.
+    :param ap_layout: "grid" or "random", see place_nodes.
+    :param seed: Seed of the placement.
+    :param sim_overwrite: Optional simulation parameters of the test.
+    :return: Test parameters with tx_nodes and ap_nodes carrying their positions and collision domains.
+    """
+    association_range = sense_range if association_range is None else association_range
+    rng = np.random.default_rng(seed)
+    ap_positions, station_positions = place_nodes(aps, stations, area, association_range, ap_layout, rng)
+
+    # Stations first, then APs
+    positions = np.concatenate((station_positions, ap_positions))
+    domains, neighbours = collision_domains(positions, sense_range)
+    ap_indices = range(stations, stations + aps)
+
+    test_params = {}
+    if sim_overwrite:
+        test_params['sim_overwrite'] = sim_overwrite
+    test_params['tx_nodes'] = [{'id': index + 1, 'cd': domains[index], 'x': round(float(x), 3), 'y': round(float(y), 3)}
+                               for index, (x, y) in enumerate(station_positions)]
+    test_params['ap_nodes'] = [{'id': index + 1, 'cd': domains[stations + index], 'x': round(float(x), 3),
+                                'y': round(float(y), 3)} for index, (x, y) in enumerate(ap_positions)]
+    test_params['topology'] = {
+        'area': list(area), 'sense_range': sense_range, 'association_range': association_range,
+        'ap_layout': ap_layout, 'seed': seed,
+        'collision_domains': len({collision_id for node_domains in domains for collision_id in node_domains}),
+        'mean_neighbours': sum(map(len, neighbours)) / len(neighbours) if neighbours else 0,
+        'hidden_terminal_pairs': hidden_terminals(neighbours, ap_indices),
+    }
+    return test_params
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a multi-AP test topology from node positions.')
+    parser.add_argument('name', type=str, help='Name of the test, written to sim/tst/<name>.json')
+    parser.add_argument('--aps', type=int, default=4, help='Number of APs')
+    parser.add_argument('--stations', type=int, default=40, help='Number of Tx stations')
+    parser.add_argument('--area', type=float, nargs=2, default=(200, 200), metavar=('WIDTH', 'HEIGHT'),
+                        help='Size of the area')
+    parser.add_argument('--range', type=float, default=60, dest='sense_range', help='Carrier-sense range')
+    parser.add_argument('--association-range', type=float, default=None,
+                        help='Maximum distance of a station to its AP, the sense range by default')
+    parser.add_argument('--ap-layout', choices=['grid', 'random'], default='grid', help='Placement of the APs')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the placement')
+    args = parser.parse_args()
+
+    test_params = generate_topology(args.aps, args.stations, tuple(args.area), args.sense_range,
+                                    args.association_range, args.ap_layout, args.seed)
+    file_name = os.path.join('sim/tst', args.name + '.json')
+    with open(file_name, 'w') as file:
+        json.dump(test_params, file)
+    print(f"Wrote {file_name}: {json.dumps(test_params['topology'])}")
+
+
+if __name__ == "__main__":
+    main()
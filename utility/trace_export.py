@@ -0,0 +1,138 @@
+"""
+trace_export.py
+
+Description:
+    The trace_export module writes the results of a run to a directory of columnar .npy files described by a JSON
+    manifest, and reads them back memory-mapped.
+    The summary holds one row per node. The traces of all nodes are concatenated into one file per column, sorted by
+    timestamp within every node, with an offsets column giving the rows of each node (trace of node i is
+    rows offsets[i]:offsets[i + 1]). A time window of a node is then found with a binary search, without reading the
+    rest of the trace.
+
+Responsibilities:
+    - Writes the node statistics and recorded histories column by column, one node at a time.
+    - Opens an exported run with np.load(mmap_mode='r') and slices node traces by time window.
+
+Usage:
+    - export_run(network, 'sim/output/run', metadata={'seed': 1}) after network.run().
+    - run = ExportedRun('sim/output/run'); run.window('Tx_Node_1', 0, 10000) returns the columns of the events in it.
+"""
+# trace_export.py
+import json
+import os
+import numpy as np
+from src.event_history import EVENT_NAMES, HISTORY_DTYPE
+
+EXPORT_FORMAT = 1
+MANIFEST_NAME = 'manifest.json'
+SUMMARY_COLUMNS = {'successful_transmissions': np.int64, 'throughput_kbps': np.float64, 'collisions': np.int64}
+
+
+def column_file(table, column):
+    return f"{table}.{column}.npy"
+
+
+def export_run(network, directory, metadata=None):
+    """
+    Exports the statistics and the histories of the nodes of a finished run.
+    :param network: The network after network.run().
+    :param directory: Directory of the export, created if needed. Existing columns are overwritten.
+    :param metadata: JSON serializable description of the run, e.g. its seed, stored in the manifest.
+    :return: The manifest.
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    statistics = network.get_statistics()
+    for column, dtype in SUMMARY_COLUMNS.items():
+        values = np.array([row.get(column, 0) for row in statistics], dtype)
+        np.save(os.path.join(directory, column_file('summary', column)), values)
+
+    # Columns are filled in place one node at a time, so only one history is held in memory
+    lengths = [len(node.history) for node in network.nodes]
+    offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+    np.save(os.path.join(directory, column_file('trace', 'offsets')), offsets)
+    columns = {field: np.lib.format.open_memmap(os.path.join(directory, column_file('trace', field)), mode='w+',
+                                                dtype=HISTORY_DTYPE[field], shape=(int(offsets[-1]),))
+               for field in HISTORY_DTYPE.names}
+    max_duration = 0
+    for index, node in enumerate(network.nodes):
+        history = node.history.to_array()
+        history = history[np.argsort(history['timestamp'], kind='stable')]
+        for field, column in columns.items():
+            column[offsets[index]:offsets[index + 1]] = history[field]
+        if len(history):
+            max_duration = max(max_duration, int(history['duration'].max()))
+    for column in columns.values():
+        column.flush()
+    del columns
+
+    manifest = {
+        'format': EXPORT_FORMAT,
+        'nodes': [row['node'] for row in statistics],
+        'types': [row['type'] for row in statistics],
+        'summary': {column: column_file('summary', column) for column in SUMMARY_COLUMNS},
+        'trace': {column: column_file('trace', column) for column in ('offsets',) + HISTORY_DTYPE.names},
+        'event_names': list(EVENT_NAMES),
+        'max_duration': max_duration,
+        'sim_params': network.sim_params,
+        'metadata': metadata or {},
+    }
+    # The manifest is written last, a directory without one holds an incomplete export
+    temporary = os.path.join(directory, f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+    with open(temporary, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temporary, os.path.join(directory, MANIFEST_NAME))
+    return manifest
+
+
+class ExportedRun:
+    def __init__(self, directory):
+        """
+        Opens the manifest of an exported run and memory-maps its columns, nothing is read until it is sliced.
+        :param directory: Directory written by export_run.
+        """
+        with open(os.path.join(directory, MANIFEST_NAME)) as file:
+            self.manifest = json.load(file)
+        if self.manifest['format'] != EXPORT_FORMAT:
+            raise ValueError(f"Unsupported export format {self.manifest['format']} in {directory}")
+        self.directory = directory
+        self.nodes = self.manifest['nodes']
+        self.node_index = {node_id: index for index, node_id in enumerate(self.nodes)}
+        self.summary = {column: np.load(os.path.join(directory, file_name), mmap_mode='r')
+                        for column, file_name in self.manifest['summary'].items()}
+        self.columns = {column: np.load(os.path.join(directory, file_name), mmap_mode='r')
+                        for column, file_name in self.manifest['trace'].items()}
+        self.offsets = self.columns.pop('offsets')
+
+    def statistics(self):
+        """
+        Returns the node statistics in the format of Network.get_statistics.
+        """
+        statistics = []
+        for index, (node_id, node_type) in enumerate(zip(self.nodes, self.manifest['types'])):
+            columns = ('successful_transmissions', 'throughput_kbps') if node_type == 'TX' else ('collisions',)
+            statistics.append({'node': node_id, 'type': node_type,
+                               **{column: self.summary[column][index].item() for column in columns}})
+        return statistics
+
+    def trace(self, node_id):
+        """
+        Returns the memory-mapped columns of the whole trace of a node.
+        """
+        index = self.node_index[node_id]
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return {column: values[start:end] for column, values in self.columns.items()}
+
+    def window(self, node_id, start, end):
+        """
+        Returns the columns of the events of a node overlapping the slots [start, end).
+        Only the rows between the two binary search bounds are read from disk.
+        """
+        trace = self.trace(node_id)
+        timestamps = trace['timestamp']
+        first = int(np.searchsorted(timestamps, start - self.manifest['max_duration'], side='left'))
+        last = int(np.searchsorted(timestamps, end, side='left'))
+        rows = {column: np.asarray(values[first:last]) for column, values in trace.items()}
+        overlapping = rows['timestamp'] + rows['duration'] > start
+        return {column: values[overlapping] for column, values in rows.items()}
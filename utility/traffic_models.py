@@ -0,0 +1,170 @@
+"""
+traffic_models.py
+
+Description:
+    The traffic_models module generates the packet arrivals of many stations at once, up to a known horizon.
+    Every model draws the arrivals of all the stations in one vectorized pass and returns them in CSR form: a flat array
+    of arrival slots grouped by station, and offsets such that the arrivals of station i are
+    arrivals[offsets[i]:offsets[i + 1]], in increasing order and strictly before the horizon.
+    The draws are laid out in the same ragged form, sized by the rate of every station, so a mix of slow and fast
+    stations does not pad every row to the fastest one.
+
+    Models:
+        - "poisson": exponential inter-arrival times of rate lambda, rounded up to whole slots.
+        - "cbr": constant bit rate, one packet every 1 / lambda seconds from a random phase.
+        - "mmpp": on/off bursty traffic, a two-state Markov modulated Poisson process. The station alternates
+          exponential on and off periods and only generates packets while on, at the rate that keeps lambda on average.
+
+Responsibilities:
+    - Generates the arrivals of every station with its own rate in one vectorized pass.
+    - Draws the row of a station from its own generator when per-station generators are given, so the streams keyed by
+      node ID of utility/random_streams.py keep working.
+
+Usage:
+    - offsets, arrivals = generate_arrivals("mmpp", rates, horizon_slots, slot_duration, rng, on_time=0.01)
+"""
+# traffic_models.py
+from math import ceil, sqrt
+import numpy as np
+
+
+def uniforms(rng, lengths):
+    """
+    Draws lengths[i] uniform numbers in [0, 1) for every row i, concatenated.
+    :param rng: numpy.random.Generator, a sequence of one Generator per row, or None for the global numpy random state.
+    """
+    if rng is None:
+        return np.random.uniform(size=int(np.sum(lengths)))
+    if isinstance(rng, np.random.Generator):
+        return rng.random(int(np.sum(lengths)))
+    return np.concatenate([row_rng.random(length) for row_rng, length in zip(rng, lengths)] + [np.zeros(0)])
+
+
+def select_rows(rng, rows):
+    """
+    Returns the generator of a subset of the rows.
+    """
+    if rng is None or isinstance(rng, np.random.Generator):
+        return rng
+    return [rng[row] for row in rows]
+
+
+def to_csr(rows, values, count):
+    """
+    Groups values by row. Values already increasing within every row keep their order.
+    :return: (offsets, values) with offsets of length count + 1.
+    """
+    if len(rows) > 1 and np.any(rows[1:] < rows[:-1]):
+        order = np.argsort(rows, kind='stable')
+        rows, values = rows[order], values[order]
+    offsets = np.zeros(count + 1, np.int64)
+    np.cumsum(np.bincount(rows, minlength=count), out=offsets[1:])
+    return offsets, values.astype(np.int64)
+
+
+def poisson_arrivals(rates, horizon_slots, slot_duration, rng=None):
+    """
+    Generates Poisson arrivals for every station.
+    The first pass draws enough inter-arrival times for the expected count of every station plus six standard
+    deviations; the rare stations that have not reached the horizon draw more, only for themselves.
+    :param rates: Arrival rate of every station in packets per second.
+    :param horizon_slots: Arrivals are generated in [0, horizon_slots).
+    :param slot_duration: The size of a slot in seconds.
+    :param rng: Generator of every row, see uniforms.
+    :return: (offsets, arrivals) in CSR form.
+    """
+    rates = np.asarray(rates, dtype=float)
+    count = len(rates)
+    pending = np.flatnonzero(rates > 0)
+    last = np.zeros(count, np.int64)
+    kept_rows, kept_values = [np.zeros(0, np.int64)], [np.zeros(0, np.int64)]
+    while pending.size:
+        expected = rates[pending] * (horizon_slots - last[pending]) * slot_duration
+        lengths = np.ceil(expected + 6 * np.sqrt(expected)).astype(np.int64) + 16
+        rows = np.repeat(pending, lengths)
+        gaps = np.log1p(-uniforms(select_rows(rng, pending), lengths))
+        gaps *= np.repeat(-1 / (rates[pending] * slot_duration), lengths)
+        gaps = np.ceil(gaps, out=gaps).astype(np.int64)
+
+        # One cumulative sum over all the rows, rebased on the start of every row
+        times = np.cumsum(gaps)
+        starts = np.cumsum(lengths) - lengths
+        times -= np.repeat(times[starts] - gaps[starts] - last[pending], lengths)
+
+        inside = times < horizon_slots
+        kept_rows.append(rows[inside])
+        kept_values.append(times[inside])
+        ends = starts + lengths - 1
+        last[pending] = times[ends]
+        pending = pending[inside[ends]]
+    return to_csr(np.concatenate(kept_rows), np.concatenate(kept_values), count)
+
+
+def cbr_arrivals(rates, horizon_slots, slot_duration, rng=None):
+    """
+    Generates constant bit rate arrivals for every station, one packet per period from a uniform random phase.
+    The period is 1 / rate rounded to whole slots.
+    :return: (offsets, arrivals) in CSR form.
+    """
+    rates = np.asarray(rates, dtype=float)
+    count = len(rates)
+    active = rates > 0
+    periods = np.ones(count)
+    periods[active] = np.maximum(1, np.round(1 / (rates[active] * slot_duration)))
+    phases = np.floor(uniforms(rng, np.ones(count, np.int64)) * periods)
+    lengths = np.where(active, np.ceil((horizon_slots - phases) / periods), 0).astype(np.int64)
+    rows = np.repeat(np.arange(count), lengths)
+    packets = np.arange(len(rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return to_csr(rows, phases[rows] + periods[rows] * packets, count)
+
+
+def mmpp_arrivals(rates, horizon_slots, slot_duration, rng=None, on_time=0.01, off_time=0.01):
+    """
+    Generates on/off bursty arrivals for every station.
+    Each station starts on with probability on_time / (on_time + off_time), then alternates exponential on and off
+    periods. Poisson arrivals are generated at the peak rate rate * (on_time + off_time) / on_time and the ones falling
+    in off periods are dropped.
+    :param on_time: Mean length of an on period in seconds.
+    :param off_time: Mean length of an off period in seconds.
+    :return: (offsets, arrivals) in CSR form.
+    """
+    rates = np.asarray(rates, dtype=float)
+    count = len(rates)
+    peak_offsets, peak_arrivals = poisson_arrivals(rates * (on_time + off_time) / on_time, horizon_slots,
+                                                   slot_duration, rng)
+
+    # Boundaries of the periods of every row: off, on, off, on... the first off period is empty when starting on
+    cycles = max(1, ceil(horizon_slots * slot_duration / (on_time + off_time)))
+    while True:
+        columns = 2 * (cycles + ceil(6 * sqrt(cycles)) + 1)
+        draws = uniforms(rng, np.full(count, columns + 1)).reshape(count, columns + 1)
+        means = np.tile([off_time, on_time], columns // 2) / slot_duration
+        periods = -np.log1p(-draws[:, 1:]) * means
+        starts_on = draws[:, 0] < on_time / (on_time + off_time)
+        periods[starts_on, 0] = 0
+        boundaries = np.cumsum(periods, axis=1)
+        if count == 0 or np.min(boundaries[:, -1]) >= horizon_slots:
+            break
+        cycles *= 2
+
+    # A single sorted search over all rows: every row is shifted past the clipped boundaries of the previous one
+    stride = horizon_slots + 1
+    keys = (np.minimum(boundaries, horizon_slots) + stride * np.arange(count)[:, None]).ravel()
+    rows = np.repeat(np.arange(count), np.diff(peak_offsets))
+    passed = np.searchsorted(keys, peak_arrivals + stride * rows, side='right') - columns * rows
+    on = passed % 2 == 1
+    return to_csr(rows[on], peak_arrivals[on], count)
+
+
+TRAFFIC_MODELS = {'poisson': poisson_arrivals, 'cbr': cbr_arrivals, 'mmpp': mmpp_arrivals}
+
+
+def generate_arrivals(model, rates, horizon_slots, slot_duration, rng=None, **options):
+    """
+    Generates the arrivals of every station with one of TRAFFIC_MODELS.
+    :param options: Parameters of the model, e.g. on_time and off_time of "mmpp".
+    :return: (offsets, arrivals) in CSR form.
+    """
+    if model not in TRAFFIC_MODELS:
+        raise ValueError(f"Invalid traffic model {model}. Model must be one of {', '.join(TRAFFIC_MODELS)}.")
+    return TRAFFIC_MODELS[model](rates, horizon_slots, slot_duration, rng, **options)